@@ -1,8 +1,10 @@
 # app.py
 from flask import Flask, render_template, jsonify, request
 import logging
+from datetime import datetime
 from backend.opcua_client import OPCUAClient
-from backend.bandsaw_simulator import materials_data, AlarmType, MachineState
+from backend.bandsaw_simulator import materials_data, AlarmType, MachineState, SectionType, invalid_settings
+from api.encoding import encode_response
 
 app = Flask(__name__,
             static_folder='../frontend/static',
@@ -10,6 +12,18 @@ app = Flask(__name__,
 
 client = OPCUAClient()
 
+# Machines served by the bulk fleet endpoints, by name
+fleet = {'BandSaw': client}
+
+def enum_value(enum_type, value):
+    """Valore dell'enum dato il valore o il nome (es. "SAFETY_BARRIER", come li invia la dashboard); None se non valido."""
+    if not isinstance(value, str):
+        return None
+    if value in enum_type.__members__:
+        return enum_type[value].value
+    return value if value in {member.value for member in enum_type} else None
+
+
 @app.route('/')
 def index():
     return render_template('dashboard.html')
@@ -50,26 +64,40 @@ def get_data():
 
         return client.run_async(fetch())
 
-    return jsonify(async_get_data())
+    return encode_response(async_get_data())
 
 
 
+def invalid_value(field):
+    """Risposta 400 se il campo manca o non ha un valore ammesso, altrimenti None."""
+    value = (request.get_json(silent=True) or {}).get(field)
+    if value is None or invalid_settings({field: value}):
+        return jsonify({'success': False, 'error': f'Valore non valido per {field}: {value}'}), 400
+    return None
+
+
 @app.route('/api/set_state', methods=['POST'])
 def set_state():
-    new_state = request.json['state']
+    requested = (request.get_json(silent=True) or {}).get('state')
+    new_state = enum_value(MachineState, requested)
+    if new_state is None:
+        return jsonify({'success': False, 'error': f'Valore non valido per state: {requested}'}), 400
 
     def async_set_state():
-        return client.run_async(client.set_node_value("ns=2;i=2", new_state))
+        return client.run_async(client.set_node_value("State", new_state))
 
     success = async_set_state()
     return jsonify({'success': success})
 
 @app.route('/api/set_material', methods=['POST'])
 def set_material():
+    error = invalid_value('material')
+    if error:
+        return error
     material = request.json['material']
 
     def async_set_material():
-        return client.run_async(client.set_node_value("ns=2;i=7", material))
+        return client.run_async(client.set_node_value("Material", material))
 
     success = async_set_material()
     return jsonify({'success': success})
@@ -77,10 +105,13 @@ def set_material():
 
 @app.route('/api/set_section', methods=['POST'])
 def set_section():
+    error = invalid_value('section')
+    if error:
+        return error
     section = request.json['section']
 
     def async_set_section():
-        return client.run_async(client.set_node_value("ns=2;i=8", section))
+        return client.run_async(client.set_node_value("Section", section))
 
     success = async_set_section()
     return jsonify({'success': success})
@@ -88,20 +119,17 @@ def set_section():
 
 @app.route('/api/set_alarm', methods=['POST'])
 def set_alarm():
-    alarm_type = request.json.get('alarm')
+    requested = (request.get_json(silent=True) or {}).get('alarm')
+    alarm_type = enum_value(AlarmType, requested)
+    if alarm_type in (None, AlarmType.NONE.value):
+        return jsonify({'success': False, 'error': f'Allarme non valido: {requested}'}), 400
 
     def async_set_alarm():
-        # Imposta lo stato della macchina su "allarme"
-        state_success = client.run_async(
-            client.set_node_value("ns=2;i=2", MachineState.ALARM.value)
-        )
-
-        # Imposta il tipo di allarme
-        alarm_success = client.run_async(
-            client.set_node_value("ns=2;i=10", alarm_type)
-        )
-
-        return state_success and alarm_success
+        # Stato "allarme" e tipo di allarme in un'unica scrittura
+        return client.run_async(client.set_node_values({
+            "State": MachineState.ALARM.value,
+            "AlarmType": alarm_type
+        }))
 
     success = async_set_alarm()
     return jsonify({'success': success})
@@ -110,26 +138,99 @@ def set_alarm():
 @app.route('/api/reset_alarm', methods=['POST'])
 def reset_alarm():
     def async_reset_alarm():
-        # Riporta la macchina allo stato inattivo
-        state_success = client.run_async(
-            client.set_node_value("ns=2;i=2", MachineState.INACTIVE.value)
-        )
-
-        # Resetta il tipo di allarme a "nessun allarme"
-        alarm_success = client.run_async(
-            client.set_node_value("ns=2;i=10", AlarmType.NONE.value)
-        )
-
-        return state_success and alarm_success
+        # Stato inattivo e "nessun allarme" in un'unica scrittura
+        return client.run_async(client.set_node_values({
+            "State": MachineState.INACTIVE.value,
+            "AlarmType": AlarmType.NONE.value
+        }))
 
     success = async_reset_alarm()
     return jsonify({'success': success})
 
+# Campi accettati da /api/commands -> (variabile BandSaw, tipo atteso: enum, str o float)
+COMMAND_FIELDS = {
+    'state': ("State", MachineState),
+    'alarm': ("AlarmType", AlarmType),
+    'material': ("Material", str),
+    'section': ("Section", str),
+    'section_type': ("SectionType", SectionType),
+    'cutting_speed': ("CuttingSpeed", float),
+    'feed_rate': ("FeedRate", float),
+    'cutting_angle': ("CuttingAngle", float),
+}
+
+
+def command_value(kind, value):
+    """Valore JSON convertito nel tipo del campo; None se il tipo JSON non è quello atteso (es. true per un numero)."""
+    if kind is float:
+        return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+    if kind is str:
+        return value if isinstance(value, str) else None
+    return enum_value(kind, value)
+
+
+@app.route('/api/commands', methods=['POST'])
+def commands():
+    """Applica un intero setup (es. {"material": ..., "section": ..., "cutting_speed": ...}) in un'unica scrittura."""
+    payload = request.get_json(silent=True) or {}
+    unknown = sorted(set(payload) - set(COMMAND_FIELDS))
+    if not payload or unknown:
+        return jsonify({'success': False, 'error': f'Campi non validi: {unknown}' if unknown else 'Nessun comando'}), 400
+
+    # Prima i tipi JSON, poi i valori: tutto o niente, un solo valore non valido annulla l'intero setup
+    settings = {field: command_value(COMMAND_FIELDS[field][1], value) for field, value in payload.items()}
+    invalid = sorted(field for field, value in settings.items() if value is None) or invalid_settings(settings)
+    if invalid:
+        return jsonify({'success': False, 'error': f'Valori non validi: {invalid}'}), 400
+
+    values = {COMMAND_FIELDS[field][0]: value for field, value in settings.items()}
+
+    success = client.run_async(client.set_node_values(values))
+    return jsonify({'success': success})
+
+
 @app.route('/api/machine_status', methods=['GET'])
 def machine_status():
     try:
         status = client.run_async(client.get_machine_status())
-        return jsonify(status)
+        return encode_response(status)
     except Exception as e:
         logging.error(f"Errore durante il recupero dello stato macchina: {e}")
         return jsonify({'error': 'Impossibile recuperare lo stato della macchina'}), 500
+
+
+@app.route('/api/fleet/status', methods=['GET'])
+def fleet_status():
+    """Stato di tutte le macchine in un unico payload colonnare (una lista per campo)."""
+    try:
+        async def fetch_all():
+            return [await machine_client.get_machine_status() for machine_client in fleet.values()]
+
+        statuses = client.run_async(fetch_all())
+        fields = sorted({key for status in statuses for key in status})
+        columns = {'machine': list(fleet)}
+        for field in fields:
+            columns[field] = [status.get(field) for status in statuses]
+        return encode_response(columns, columnar=True, compress=True)
+    except Exception as e:
+        logging.error(f"Errore durante il recupero dello stato della flotta: {e}")
+        return jsonify({'error': 'Impossibile recuperare lo stato della flotta'}), 500
+
+
+
+@app.route('/api/events', methods=['GET'])
+def alarm_events():
+    """Storico degli allarmi (attivazioni e rientri); ?since=<ISO 8601> per i soli eventi successivi."""
+    since = request.args.get('since')
+    try:
+        since = datetime.fromisoformat(since) if since else None
+    except ValueError:
+        return jsonify({'error': 'Parametro since non valido'}), 400
+
+    events = client.run_async(client.get_alarm_events(since=since, limit=request.args.get('limit', 0, type=int)))
+    if events is None:
+        return jsonify({'error': 'Impossibile recuperare lo storico allarmi'}), 500
+
+    fields = ['time', 'alarm_type', 'active', 'count', 'severity', 'message']
+    return encode_response({field: [event[field] for event in events] for field in fields},
+                           columnar=True, compress=True)
\ No newline at end of file
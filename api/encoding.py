@@ -0,0 +1,195 @@
+# encoding.py
+import gzip
+import json
+import math
+import struct
+from typing import Dict, List
+
+from flask import Response, request
+from backend.bandsaw_simulator import AlarmType, MachineState, SectionType
+
+try:
+    import msgpack
+except ImportError:  # MessagePack support is optional
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+FRAME_MIMETYPE = "application/x-bandsaw-frame"
+
+# Payloads smaller than this are not worth compressing
+COMPRESS_MIN_SIZE = 512
+
+# Packed frame layout
+#   header : FRAME_MAGIC, '<IB' row count + field count,
+#            then per field '<B' name length, name (utf-8), '<B' kind
+#   columns: one per field, in header order
+#            KIND_F64  -> rows x '<d' (NaN for missing values)
+#            KIND_I64  -> null bitmap (ceil(rows / 8) bytes, bit set = missing), then rows x '<q'
+#            KIND_STR  -> rows x ('<H' length + utf-8)
+#            KIND_BOOL -> rows x '<B' 0/1 (ENUM_MISSING for missing values)
+#            enums     -> rows x '<B' code (ENUM_MISSING for unknown values)
+FRAME_MAGIC = b"BSF1"
+FRAME_HEADER = struct.Struct("<IB")
+
+KIND_F64 = 0
+KIND_I64 = 1
+KIND_STR = 2
+KIND_STATE = 3
+KIND_ALARM = 4
+KIND_SECTION_TYPE = 5
+KIND_BOOL = 6
+
+ENUM_MISSING = 255
+
+# Enum codes follow the declaration order of the enums in bandsaw_simulator
+ENUM_KINDS = {
+    KIND_STATE: [member.value for member in MachineState],
+    KIND_ALARM: [member.value for member in AlarmType],
+    KIND_SECTION_TYPE: [member.value for member in SectionType],
+}
+_ENUM_CODES = {kind: {value: code for code, value in enumerate(values)} for kind, values in ENUM_KINDS.items()}
+
+# Fields carrying enum strings, by payload key
+ENUM_FIELDS = {
+    "state": KIND_STATE,
+    "alarm_type": KIND_ALARM,
+    "section_type": KIND_SECTION_TYPE,
+}
+
+_FIELD_KINDS = {int: KIND_I64, float: KIND_F64}
+
+
+def encode_frame(columns: Dict[str, List]) -> bytes:
+    """Pack equally long columns into a binary frame"""
+    rows = len(next(iter(columns.values()), []))
+    header = [FRAME_MAGIC, FRAME_HEADER.pack(rows, len(columns))]
+    body = []
+    for name, values in columns.items():
+        kind = _column_kind(name, values)
+        encoded_name = name.encode("utf-8")
+        header.append(struct.pack("<B", len(encoded_name)) + encoded_name + struct.pack("<B", kind))
+
+        if kind == KIND_F64:
+            body.append(struct.pack(f"<{rows}d", *(math.nan if v is None else float(v) for v in values)))
+        elif kind == KIND_I64:
+            body.append(_null_bitmap(values))
+            body.append(struct.pack(f"<{rows}q", *(0 if v is None else int(v) for v in values)))
+        elif kind == KIND_BOOL:
+            body.append(bytes(ENUM_MISSING if v is None else int(bool(v)) for v in values))
+        elif kind == KIND_STR:
+            for value in values:
+                encoded = ("" if value is None else str(value)).encode("utf-8")
+                body.append(struct.pack("<H", len(encoded)) + encoded)
+        else:
+            codes = _ENUM_CODES[kind]
+            body.append(bytes(codes.get(v, ENUM_MISSING) for v in values))
+    return b"".join(header + body)
+
+
+def decode_frame(data: bytes) -> Dict[str, List]:
+    """Unpack a frame produced by encode_frame back into columns"""
+    if data[:len(FRAME_MAGIC)] != FRAME_MAGIC:
+        raise ValueError("Not a BandSaw frame")
+    pos = len(FRAME_MAGIC)
+    rows, field_count = FRAME_HEADER.unpack_from(data, pos)
+    pos += FRAME_HEADER.size
+
+    fields = []
+    for _ in range(field_count):
+        name_len = data[pos]
+        fields.append((data[pos + 1:pos + 1 + name_len].decode("utf-8"), data[pos + 1 + name_len]))
+        pos += name_len + 2
+
+    columns = {}
+    for name, kind in fields:
+        if kind == KIND_F64:
+            values = [None if math.isnan(v) else v for v in struct.unpack_from(f"<{rows}d", data, pos)]
+            pos += rows * 8
+        elif kind == KIND_I64:
+            bitmap = data[pos:pos + (rows + 7) // 8]
+            pos += len(bitmap)
+            values = [None if bitmap[i // 8] & (1 << (i % 8)) else v
+                      for i, v in enumerate(struct.unpack_from(f"<{rows}q", data, pos))]
+            pos += rows * 8
+        elif kind == KIND_BOOL:
+            values = [None if code == ENUM_MISSING else bool(code) for code in data[pos:pos + rows]]
+            pos += rows
+        elif kind == KIND_STR:
+            values = []
+            for _ in range(rows):
+                (length,) = struct.unpack_from("<H", data, pos)
+                values.append(data[pos + 2:pos + 2 + length].decode("utf-8"))
+                pos += 2 + length
+        else:
+            enum_values = ENUM_KINDS[kind]
+            values = [enum_values[code] if code < len(enum_values) else None for code in data[pos:pos + rows]]
+            pos += rows
+        columns[name] = values
+    return columns
+
+
+def encode_response(payload: Dict, columnar: bool = False, compress: bool = False, status: int = 200) -> Response:
+    """Serialize payload in the encoding requested by the Accept header.
+
+    JSON stays the default. Single records are sent to the frame encoder as
+    one-row columns; columnar payloads (dict of equally long lists) are packed
+    as they are. With compress=True the body is gzip/zstd encoded when the
+    client accepts it.
+    """
+    supported = [JSON_MIMETYPE, FRAME_MIMETYPE]
+    if msgpack is not None:
+        supported += [MSGPACK_MIMETYPE, "application/x-msgpack"]
+    mimetype = request.accept_mimetypes.best_match(supported, default=JSON_MIMETYPE)
+
+    if mimetype == FRAME_MIMETYPE:
+        body = encode_frame(payload if columnar else {key: [value] for key, value in payload.items()})
+    elif mimetype in (MSGPACK_MIMETYPE, "application/x-msgpack"):
+        body = msgpack.packb(payload, use_bin_type=True)
+    else:
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    response = Response(body, status=status, mimetype=mimetype)
+    response.vary.add("Accept")
+
+    if compress:
+        response.vary.add("Accept-Encoding")
+        if len(body) >= COMPRESS_MIN_SIZE:
+            codings = ["gzip"] + (["zstd"] if zstandard is not None else [])
+            coding = request.accept_encodings.best_match(codings)
+            if coding == "zstd":
+                response.set_data(zstandard.ZstdCompressor().compress(body))
+                response.content_encoding = "zstd"
+            elif coding == "gzip":
+                response.set_data(gzip.compress(body, compresslevel=5))
+                response.content_encoding = "gzip"
+    return response
+
+
+def _null_bitmap(values: List) -> bytes:
+    bitmap = bytearray((len(values) + 7) // 8)
+    for i, value in enumerate(values):
+        if value is None:
+            bitmap[i // 8] |= 1 << (i % 8)
+    return bytes(bitmap)
+
+
+def _column_kind(name: str, values: List) -> int:
+    if name in ENUM_FIELDS:
+        return ENUM_FIELDS[name]
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, bool) for v in present):
+        return KIND_BOOL
+    kinds = {KIND_I64 if isinstance(v, bool) else _FIELD_KINDS.get(type(v), KIND_STR)
+             for v in present}
+    if KIND_STR in kinds:
+        return KIND_STR
+    if KIND_I64 in kinds and KIND_F64 not in kinds:
+        return KIND_I64
+    return KIND_F64
@@ -0,0 +1,79 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from backend.bandsaw_simulator import AlarmType
+
+
+@dataclass
+class AlarmEvent:
+    alarm: AlarmType
+    active: bool
+    timestamp: datetime
+    count: int = 1  # Identical consecutive events merged into this one
+
+    @property
+    def message(self) -> str:
+        return f"{self.alarm.value} {'attivo' if self.active else 'rientrato'}"
+
+
+class AlarmEventQueue:
+    """Bounded hand-off between the simulator and the OPC-UA event publisher.
+
+    push() is called synchronously from the simulator and never blocks: events
+    wait in a pending list where repeats of the same alarm transition are
+    coalesced. flush() moves them into the bounded queue and waits when the
+    publisher falls behind, so the simulation tick is throttled instead of
+    dropping alarms.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._pending: deque = deque()
+        self.coalesced = 0
+
+    def push(self, alarm: AlarmType, active: bool, timestamp: Optional[datetime] = None):
+        """Queue an alarm transition, merging it with an identical pending one"""
+        timestamp = timestamp or datetime.now(timezone.utc)
+        if self._pending:
+            last = self._pending[-1]
+            if last.alarm == alarm and last.active == active:
+                last.count += 1
+                last.timestamp = timestamp
+                self.coalesced += 1
+                return
+        self._pending.append(AlarmEvent(alarm, active, timestamp))
+
+    async def flush(self):
+        """Hand pending events to the publisher, waiting for room in the queue"""
+        while self._pending:
+            await self._queue.put(self._pending.popleft())
+
+    async def get(self) -> AlarmEvent:
+        return await self._queue.get()
+
+    def task_done(self):
+        self._queue.task_done()
+
+
+async def publish_alarm_events(queue: AlarmEventQueue, event_generator):
+    """Emit queued alarm transitions as OPC-UA events, in order.
+
+    An event that fails to trigger is logged and skipped: if this task ended,
+    the queue would fill up and flush() would block the simulation tick and
+    client writes for good.
+    """
+    while True:
+        event = await queue.get()
+        try:
+            event_generator.event.AlarmType = event.alarm.value
+            event_generator.event.Active = event.active
+            event_generator.event.Count = event.count
+            event_generator.event.Severity = 800 if event.active else 100
+            await event_generator.trigger(time_attr=event.timestamp, message=event.message)
+        except Exception as e:
+            print(f"Error publishing alarm event {event.message}: {e}")
+        finally:
+            queue.task_done()
@@ -1,8 +1,9 @@
 from enum import Enum
 from dataclasses import dataclass
+import math
 import random
 from datetime import datetime, timedelta
-from typing import Dict, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 
 
 class MachineState(Enum):
@@ -110,13 +111,87 @@ materials_data = {
 }
 
 
+SECTIONS = ["<100mm", "100-400mm"]
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+_SETTING_CHECKS = {
+    "state": lambda value: value in {state.value for state in MachineState},
+    "alarm": lambda value: value in {alarm.value for alarm in AlarmType},
+    "material": lambda value: value in materials_data,
+    "section": lambda value: value in SECTIONS,
+    "section_type": lambda value: value in {section_type.value for section_type in SectionType},
+    "cutting_speed": lambda value: _is_number(value) and value > 0,
+    "feed_rate": lambda value: _is_number(value) and value > 0,
+    "cutting_angle": lambda value: _is_number(value) and 0 <= value <= 90,
+}
+
+
+def _clip(value, low: float = -math.inf, high: float = math.inf):
+    """Clip a float, or a NumPy array element-wise"""
+    if isinstance(value, (int, float)):
+        return min(high, max(low, value))
+    return value.clip(low, high)
+
+
+class _RandomStream:
+    """Uniform draws from a NumPy generator, refilled in blocks.
+
+    next() serves one float cheaply; take() serves the next values of the same
+    sequence as an array, and untake() gives back the unused end of the last take().
+    """
+    BLOCK = 4096
+
+    def __init__(self, seed: int):
+        import numpy as np
+        self._np = np
+        self._rng = np.random.default_rng(seed)
+        self._values: List[float] = []
+        self._position = 0
+
+    def _fill(self, count: int):
+        if len(self._values) - self._position < count:
+            self._values = self._values[self._position:] + self._rng.random(max(self.BLOCK, count)).tolist()
+            self._position = 0
+
+    def next(self) -> float:
+        self._fill(1)
+        self._position += 1
+        return self._values[self._position - 1]
+
+    def take(self, count: int):
+        self._fill(count)
+        self._position += count
+        return self._np.array(self._values[self._position - count:self._position])
+
+    def untake(self, count: int):
+        self._position -= count
+
+
+def invalid_settings(settings: Dict) -> List[str]:
+    """Names of the settings whose value cannot be applied.
+
+    Keys are state, alarm, material, section, section_type, cutting_speed,
+    feed_rate and cutting_angle, with enum values given as strings. Other keys
+    are ignored.
+    """
+    return [name for name, value in settings.items()
+            if name in _SETTING_CHECKS and not _SETTING_CHECKS[name](value)]
+
+
 class BandSawSimulator:
-    def __init__(self):
+    def __init__(self, clock: Optional[datetime] = None):
+        # Simulated clock for headless runs; None follows wall-clock time
+        self.clock = clock
+
         # Machine state
         self.state = MachineState.INACTIVE
         self.alarm = AlarmType.NONE
-        self.last_state_change = datetime.now()
-        self.last_maintenance = datetime.now()
+        self.last_state_change = self.now()
+        self.last_maintenance = self.now()
 
         # Production metrics
         self.pieces = 0
@@ -125,6 +200,7 @@ class BandSawSimulator:
         self.pieces_per_hour = 0
         self.last_piece_time = None
         self.next_pause_at = 15
+        self.cut_progress = 0.0  # Seconds spent on the piece being cut
 
         # Machine parameters
         self.material = "Acciai al carbonio St 37/42"
@@ -150,12 +226,46 @@ class BandSawSimulator:
         self.TEMP_WARNING = 350
         self.TEMP_CRITICAL = 600
 
+        # Physics model rates, per second of simulated time
+        self.AMBIENT_TEMPERATURE = 20.0
+        self.MAX_TEMPERATURE = 700.0
+        self.HEATING_RATE = 0.45  # °C/s at full power
+        self.IDLE_COOLING_RATE = 0.2  # °C/s at THERMAL_REFERENCE_DELTA above ambient
+        self.THERMAL_REFERENCE_DELTA = 100.0  # °C above ambient at which cooling rates are quoted
+        self.WEAR_RATE = 0.02  # %/s at recommended parameters
+        self.COOLANT_USE_RATE = 0.035  # %/s at TEMP_NORMAL_MAX
+
+        # Feed travel per straight cut, in feed rate units x s: at typical feed
+        # rates a small section takes about a second
+        self.CUT_LENGTHS = {"<100mm": 0.5, "100-400mm": 1.25}
+        self.CUT_TOLERANCE = 1e-6  # s, a cut this close to done at the end of a tick finishes in it
+        self.JAM_PROBABILITY = 0.001  # Per piece cut
+
+        # step_n holds operating conditions for at most this long (s) and this many ticks per batch
+        self.BATCH_HORIZON = 60.0
+        self.BATCH_TICKS = 100000
+
+        # Piece outcomes (scrap, jams) come from their own NumPy stream, so step_n
+        # can draw them for many pieces at once; seeded from random for reproducibility
+        self._piece_seed = random.getrandbits(64)
+        self._piece_draws = None
+
         # Performance tracking
-        self.start_time = datetime.now()
-        self.downtime = timedelta()
+        self.start_time = self.now()
+        self.production_time = timedelta()  # Time not spent INACTIVE, stops included
+        self.downtime = timedelta()  # Time stopped by alarms and errors
+        self.ideal_cutting_time = 0.0  # s the attempted pieces take at the fastest allowed feed
+        self.last_update = None
+
+        # Called as listener(alarm_type, active) on every alarm set/reset
+        self.alarm_listeners = []
 
         self.update_recommended_parameters()
 
+    def now(self) -> datetime:
+        """Current time, from the simulated clock when one is set"""
+        return self.clock if self.clock is not None else datetime.now()
+
     def update_recommended_parameters(self):
         """Calculate recommended cutting parameters based on current settings"""
         material_props = materials_data[self.material]
@@ -175,46 +285,262 @@ class BandSawSimulator:
         self.recommended_cutting_speed = ((base_speed_range[0] + base_speed_range[1]) / 2) * final_factor
         self.recommended_feed_rate = ((base_feed_range[0] + base_feed_range[1]) / 2) * final_factor
 
-    def calculate_power_consumption(self) -> float:
-        """Calculate power consumption based on current parameters"""
+    @property
+    def piece_draws(self) -> _RandomStream:
+        """Random stream for piece outcomes, created on first use"""
+        if self._piece_draws is None:
+            self._piece_draws = _RandomStream(self._piece_seed)
+        return self._piece_draws
+
+    def expected_power_consumption(self, temperature: Optional[float] = None,
+                                   blade_wear: Optional[float] = None) -> float:
+        """Power consumption without the random variation, at the current or given temperature and wear"""
+        temperature = self.temperature if temperature is None else temperature
+        blade_wear = self.blade_wear if blade_wear is None else blade_wear
         material_props = materials_data[self.material]
 
         base_power = (material_props.tensile_strength * self.cutting_speed * self.feed_rate) / 1000
 
         # Adjustments based on conditions
-        temp_factor = 1.0 + max(0, (self.temperature - self.TEMP_NORMAL_MAX) / self.TEMP_NORMAL_MAX) * 0.3
-        wear_factor = 1.0 + (self.blade_wear / 100) * 0.2
+        temp_factor = 1.0 + max(0, (temperature - self.TEMP_NORMAL_MAX) / self.TEMP_NORMAL_MAX) * 0.3
+        wear_factor = 1.0 + (blade_wear / 100) * 0.2
         angle_factor = 1.0 + (self.cutting_angle / 45) * 0.15
 
+        return base_power * temp_factor * wear_factor * angle_factor
+
+    def calculate_power_consumption(self) -> float:
+        """Calculate power consumption based on current parameters"""
         # Random variation (±5%)
-        variation = random.uniform(0.95, 1.05)
+        return self.expected_power_consumption() * random.uniform(0.95, 1.05)
 
-        return base_power * temp_factor * wear_factor * angle_factor * variation
+    def thermal_coefficients(self, consumption: Optional[float] = None) -> Tuple[float, float]:
+        """Heating rate (°C/s) and cooling constant (1/s) for the current operating conditions.
 
-    def update_temperature(self):
-        """Update machine temperature based on operating conditions"""
+        consumption defaults to the last computed one.
+        """
         if self.state == MachineState.RUNNING:
-            # Calculate temperature increase based on multiple factors
-            power_factor = min(1.0, self.consumption / self.MAX_POWER)
+            consumption = self.consumption if consumption is None else consumption
+            power_factor = min(1.0, consumption / self.MAX_POWER)
             material_cooling = materials_data[self.material].thermal_conductivity / 100
             coolant_efficiency = self.coolant_level / 100
+            return (self.HEATING_RATE * power_factor,
+                    material_cooling * coolant_efficiency / self.THERMAL_REFERENCE_DELTA)
+        return 0.0, self.IDLE_COOLING_RATE / self.THERMAL_REFERENCE_DELTA
+
+    def wear_rate(self) -> float:
+        """Blade wear rate (%/s) while cutting with the current parameters"""
+        deviation = (abs(self.cutting_speed - self.recommended_cutting_speed) / self.recommended_cutting_speed +
+                     abs(self.feed_rate - self.recommended_feed_rate) / self.recommended_feed_rate) / 2
+        material_wear = materials_data[self.material].hardness / 1000
+        return self.WEAR_RATE * (1 + deviation) * (1 + material_wear)
+
+    def integrate(self, dt: float):
+        """Advance temperature, blade wear and coolant by dt seconds.
+
+        Rates are taken from the conditions at the start of the interval. Within
+        it the temperature follows the exact solution of
+        dT/dt = heating - k * (T - ambient), blade wear grows linearly and the
+        coolant drains with the time integral of the temperature. All three are
+        monotonic over the interval, so alarm thresholds cannot be crossed and
+        left again unnoticed.
+        """
+        if dt <= 0:
+            return
+        heating, k = self.thermal_coefficients()
+        start_temperature = self.temperature
+        if k > 0:
+            equilibrium = self.AMBIENT_TEMPERATURE + heating / k
+            decay = math.exp(-k * dt)
+            end_temperature = equilibrium + (start_temperature - equilibrium) * decay
+            temperature_integral = equilibrium * dt + (start_temperature - equilibrium) * (1 - decay) / k
+        else:
+            end_temperature = start_temperature + heating * dt
+            temperature_integral = (start_temperature + end_temperature) / 2 * dt
+        self.temperature = min(self.MAX_TEMPERATURE, max(self.AMBIENT_TEMPERATURE, end_temperature))
 
-            base_increase = random.uniform(0.3, 0.6) * power_factor
-            cooling_effect = material_cooling * coolant_efficiency
-
-            net_change = base_increase - cooling_effect
-
-            # Apply temperature change with limits
-            self.temperature = min(700, max(20, self.temperature + net_change))
+        if self.state == MachineState.RUNNING:
+            self.blade_wear = min(100, self.blade_wear + self.wear_rate() * dt)
+            coolant_use = self.COOLANT_USE_RATE * temperature_integral / self.TEMP_NORMAL_MAX
+            self.coolant_level = max(0, self.coolant_level - coolant_use)
+
+    def step_n(self, n: int, dt: float):
+        """Advance the simulation by n ticks of dt seconds in one call.
+
+        Equivalent to n update_state(dt) calls on a simulated clock, without
+        their per-tick cost. Stretches in which the machine keeps its state are
+        done as one batch: temperature, wear and coolant follow the closed form
+        of integrate() with the operating conditions (expected power, coolant
+        level) of the batch start, for at most BATCH_HORIZON seconds, and the
+        outcomes of all pieces cut in the batch are drawn with NumPy. Ticks
+        that may change the state (alarms, break-in, the end of a pause) go
+        through update_state. Without a simulated clock, the ticks of one call
+        all happen now, as they would in a tight update_state loop.
+        """
+        remaining = n
+        while remaining > 0:
+            done = 0
+            if dt > 0:
+                if self.state == MachineState.RUNNING:
+                    done = self._cut_batch(remaining, dt)
+                elif self.state != MachineState.BREAK_IN:
+                    done = self._idle_batch(remaining, dt)
+            if not done:
+                self.update_state(dt)
+                done = 1
+            remaining -= done
+
+    def _idle_batch(self, n: int, dt: float) -> int:
+        """Run up to n ticks of a machine that is not cutting and keeps its state; returns the ticks run"""
+        step = self.tick_step(dt)
+        if self.state == MachineState.PAUSED:
+            # update_state resumes on the first tick at least 5s into the pause
+            waited = self.now() + step - self.last_state_change
+            if waited >= timedelta(seconds=5):
+                return 0
+            if step:
+                n = min(n, math.ceil((timedelta(seconds=5) - waited) / step))
+        # Idle, temperature only falls and wear and coolant stay put
+        if self.state != MachineState.ALARM and (
+                self.temperature > self.TEMP_CRITICAL or self.blade_wear >= 90 or self.coolant_level <= 10 or
+                max(self.consumption, self.expected_power_consumption() * 1.05) > self.MAX_POWER * 1.1):
+            return 0
+        if n <= 0:
+            return 0
+
+        if self.clock is not None:
+            self.clock += step * n
+        self.last_update = self.now()
+        self.book_interval(timedelta(seconds=dt) * n)
+        self.integrate(n * dt)  # Exact: the idle cooling rates do not change
+        self.consumption = self.calculate_power_consumption()
+        return n
+
+    def _cut_batch(self, n: int, dt: float) -> int:
+        """Run up to n ticks of cutting as one batch; returns the ticks run, 0 if the next tick may change state"""
+        import numpy as np
+
+        n = min(n, int(self.BATCH_HORIZON / dt), self.BATCH_TICKS)
+        if n < 2 or self.pieces >= self.next_pause_at or self.consumption > self.MAX_POWER * 1.1:
+            return 0
+
+        # Temperature, wear and coolant at the end of each tick (closed form of integrate)
+        heating, k = self.thermal_coefficients(self.expected_power_consumption())
+        elapsed = np.arange(1, n + 1) * dt
+        if k > 0:
+            equilibrium = self.AMBIENT_TEMPERATURE + heating / k
+            decay = np.exp(-k * elapsed)
+            temperature = equilibrium + (self.temperature - equilibrium) * decay
+            temperature_integral = equilibrium * elapsed + (self.temperature - equilibrium) * (1 - decay) / k
         else:
-            # Cooling when not running
-            cooling_rate = 0.4 if self.temperature > self.TEMP_WARNING else 0.2
-            self.temperature = max(20.0, self.temperature - random.uniform(0.2, cooling_rate))
+            temperature = self.temperature + heating * elapsed
+            temperature_integral = (self.temperature + temperature) / 2 * elapsed
+        temperature = np.clip(temperature, self.AMBIENT_TEMPERATURE, self.MAX_TEMPERATURE)
+        # Summed tick by tick like integrate(), so the wear alarm fires on the same tick
+        blade_wear = np.minimum(100, np.add.accumulate(np.r_[self.blade_wear, np.full(n, self.wear_rate() * dt)])[1:])
+        coolant = np.maximum(0, self.coolant_level -
+                             self.COOLANT_USE_RATE * temperature_integral / self.TEMP_NORMAL_MAX)
+
+        # Stop before the first tick that raises an alarm
+        alarm = (temperature > self.TEMP_CRITICAL) | (blade_wear >= 90) | (coolant <= 10)
+        if alarm.any():
+            n = int(alarm.argmax())
+        peak_power = self.expected_power_consumption(max(self.temperature, temperature[-1]), blade_wear[-1])
+        if n < 2 or peak_power * 1.05 > self.MAX_POWER * 1.1:
+            return 0
+
+        # Tick in which each piece is finished, as advance_production counts them
+        cycle_time = self.cycle_time()
+        count = int((self.cut_progress + n * dt + self.CUT_TOLERANCE) / cycle_time) + 1
+        pieces = np.arange(1, count + 1)
+        ticks = np.maximum(1, np.ceil((pieces * cycle_time - self.CUT_TOLERANCE - self.cut_progress) / dt))
+        ticks = ticks[ticks <= n].astype(int)
+        count = len(ticks)
+
+        # Outcomes, drawn per piece in update_state's order: scrap, then jam
+        draws = self.piece_draws.take(2 * count).reshape(count, 2)
+        scrap = draws[:, 0] < self.scrap_probability(temperature[ticks - 1], blade_wear[ticks - 1],
+                                                     coolant[ticks - 1])
+        jammed = draws[:, 1] < self.JAM_PROBABILITY
+        good = self.pieces + np.cumsum(~scrap)
+        paused = good >= self.next_pause_at
+
+        # A jam ends the batch right after its piece; reaching the pause count
+        # ends it after the tick's last piece, unless a piece of that tick jams
+        jam = int(jammed.argmax()) if jammed.any() else None
+        pause = int(paused.argmax()) if paused.any() else None
+        if jam is not None and (pause is None or ticks[jam] <= ticks[pause]):
+            n, count = int(ticks[jam]), jam + 1
+        elif pause is not None:
+            n = int(ticks[pause])
+            count = int(np.searchsorted(ticks, n, side="right"))
+            jam = None
+        self.piece_draws.untake(2 * (len(ticks) - count))
+
+        step = self.tick_step(dt)
+        start = self.now()
+        if self.clock is not None:
+            self.clock += step * n
+        self.last_update = self.now()
+        self.book_interval(timedelta(seconds=dt) * n)
+        self.temperature = float(temperature[n - 1])
+        self.blade_wear = float(blade_wear[n - 1])
+        self.coolant_level = float(coolant[n - 1])
+
+        scrapped = int(scrap[:count].sum())
+        self.total_pieces_attempted += count
+        self.scrap_pieces += scrapped
+        self.pieces += count - scrapped
+        self.ideal_cutting_time += count * self.cycle_time(self.recommended_feed_rate * 1.2)
+        for piece in range(max(0, count - 2), count):
+            left_over = self.cut_progress + ticks[piece] * dt - (piece + 1) * cycle_time
+            self.record_piece_time(start + step * int(ticks[piece]) - timedelta(seconds=left_over))
+        self.cut_progress += n * dt - count * cycle_time
+
+        if jam is not None:
+            self.set_alarm(AlarmType.MATERIAL_JAM)
+        elif pause is not None:
+            self.state = MachineState.PAUSED
+            self.next_pause_at += 15
+            self.last_state_change = self.now()
+        self.consumption = self.calculate_power_consumption()
+        return n
+
+    def tick_step(self, dt: float) -> timedelta:
+        """How far the time seen by update_state moves per tick of dt seconds"""
+        return timedelta(seconds=dt) if self.clock is not None else timedelta()
+
+    def cycle_time(self, feed_rate: Optional[float] = None) -> float:
+        """Seconds to cut one piece at feed_rate (default: the current feed rate).
+
+        Mitre cuts are longer by 1 / cos(angle). An unset feed rate (0) cuts at
+        the recommended one.
+        """
+        if feed_rate is None:
+            feed_rate = self.feed_rate
+        if feed_rate <= 0:
+            feed_rate = self.recommended_feed_rate
+        cut_length = self.CUT_LENGTHS[self.section] / math.cos(math.radians(self.cutting_angle))
+        return cut_length / feed_rate
+
+    def advance_production(self, dt: float, current_time: datetime) -> int:
+        """Cut for dt seconds ending at current_time and return the number of pieces finished"""
+        self.cut_progress += dt
+        cycle_time = self.cycle_time()
+        finished = 0
+        while self.cut_progress >= cycle_time - self.CUT_TOLERANCE:
+            self.cut_progress -= cycle_time
+            finished += 1
+            self.process_piece(current_time - timedelta(seconds=self.cut_progress))
+            if self.piece_draws.next() < self.JAM_PROBABILITY:
+                self.set_alarm(AlarmType.MATERIAL_JAM)
+                break
+        return finished
 
-    def process_piece(self):
-        """Process a single piece and determine quality outcome"""
-        self.total_pieces_attempted += 1
+    def scrap_probability(self, temperature, blade_wear, coolant_level):
+        """Probability that a piece cut in the given conditions is scrap.
 
+        Takes and returns floats or NumPy arrays of per-piece conditions.
+        """
         # Base error probability
         error_prob = 0.05
 
@@ -225,44 +551,67 @@ class BandSawSimulator:
 
         # Machine condition effects
         condition_error = (
-                (self.blade_wear / 100) * 0.3 +
-                (1 - self.coolant_level / 100) * 0.2 +
-                max(0, (self.temperature - self.TEMP_NORMAL_MAX) / self.TEMP_CRITICAL) * 0.3
+                (blade_wear / 100) * 0.3 +
+                (1 - coolant_level / 100) * 0.2 +
+                _clip((temperature - self.TEMP_NORMAL_MAX) / self.TEMP_CRITICAL, low=0) * 0.3
         )
 
         # Material and angle effects
         material_difficulty = materials_data[self.material].hardness / 250  # Normalize to ~1
         angle_difficulty = self.cutting_angle / 90
 
-        total_error_prob = min(0.95, error_prob + param_error + condition_error +
-                               (material_difficulty * 0.1) + (angle_difficulty * 0.1))
+        return _clip(error_prob + param_error + condition_error +
+                     (material_difficulty * 0.1) + (angle_difficulty * 0.1), high=0.95)
+
+    def process_piece(self, finished_at: Optional[datetime] = None):
+        """Process a single piece and determine quality outcome"""
+        self.total_pieces_attempted += 1
+        # Reference for OEE performance: the fastest feed set_cutting_parameters allows
+        self.ideal_cutting_time += self.cycle_time(self.recommended_feed_rate * 1.2)
 
         # Determine piece outcome
-        if random.random() < total_error_prob:
+        if self.piece_draws.next() < self.scrap_probability(self.temperature, self.blade_wear, self.coolant_level):
             self.scrap_pieces += 1
         else:
             self.pieces += 1
 
-        # Update production rate metrics
-        current_time = datetime.now()
+        self.record_piece_time(finished_at or self.now())
+
+    def record_piece_time(self, finished_at: datetime):
+        """Update production rate metrics for a piece finished at finished_at"""
         if self.last_piece_time:
-            time_diff = (current_time - self.last_piece_time).total_seconds() / 3600
+            time_diff = (finished_at - self.last_piece_time).total_seconds() / 3600
             self.pieces_per_hour = 1 / time_diff if time_diff > 0 else 0
-        self.last_piece_time = current_time
-
-    def update_state(self):
-        """Main update function for machine state and parameters"""
-        current_time = datetime.now()
+        self.last_piece_time = finished_at
+
+    def update_state(self, dt: Optional[float] = None):
+        """Main update function for machine state and parameters.
+
+        dt is the simulated time since the previous update in seconds; when
+        omitted the wall-clock time since the previous call is used (1s on the
+        first call). With a simulated clock, the clock is advanced by dt
+        (default 1s). Pieces are cut in simulated time (see cycle_time), so
+        wear, coolant use and energy per piece do not depend on the tick rate.
+        """
+        if self.clock is not None:
+            self.clock += timedelta(seconds=1.0 if dt is None else dt)
+        current_time = self.now()
         time_in_state = (current_time - self.last_state_change).total_seconds()
+        if dt is None:
+            dt = (current_time - self.last_update).total_seconds() if self.last_update else 1.0
+        self.last_update = current_time
+
+        self.book_interval(timedelta(seconds=dt))
+        self.integrate(dt)
 
         if self.check_alarms():
+            self.consumption = self.calculate_power_consumption()
             return
 
         # Handle different machine states
         if self.state == MachineState.RUNNING:
-            self.update_wear()
-            self.process_piece()
-            if self.pieces == self.next_pause_at:
+            self.advance_production(dt, current_time)
+            if self.state == MachineState.RUNNING and self.pieces >= self.next_pause_at:
                 self.state = MachineState.PAUSED
                 self.next_pause_at += 15
                 self.last_state_change = current_time
@@ -272,23 +621,27 @@ class BandSawSimulator:
             self.last_state_change = current_time
 
         elif self.state == MachineState.BREAK_IN:
-            self.handle_break_in()
+            self.handle_break_in(dt, current_time)
 
-        self.update_temperature()
         self.consumption = self.calculate_power_consumption()
 
-    def update_wear(self):
-        """Update wear-related parameters during operation"""
-        wear_factor = (
-                              abs(self.cutting_speed - self.recommended_cutting_speed) / self.recommended_cutting_speed +
-                              abs(self.feed_rate - self.recommended_feed_rate) / self.recommended_feed_rate
-                      ) / 2
-        base_wear = random.uniform(0.01, 0.03)
-        material_wear = materials_data[self.material].hardness / 1000
-        self.blade_wear = min(100, self.blade_wear + (base_wear * (1 + wear_factor) * (1 + material_wear)))
+    def book_interval(self, elapsed: timedelta):
+        """Book simulated time under the state the machine was in during it"""
+        if self.state != MachineState.INACTIVE:
+            self.production_time += elapsed
+        if self.state in (MachineState.ALARM, MachineState.ERROR, MachineState.EMERGENCY_STOP):
+            self.downtime += elapsed
 
-        coolant_use = random.uniform(0.02, 0.05) * (self.temperature / self.TEMP_NORMAL_MAX)
-        self.coolant_level = max(0, self.coolant_level - coolant_use)
+    def book_downtime(self, duration: timedelta):
+        """Account for a stop outside the simulation, such as maintenance in a headless run.
+
+        Advances the simulated clock, when one is set, by the stop duration.
+        """
+        if self.clock is not None:
+            self.clock += duration
+            self.last_update = self.clock
+        self.production_time += duration
+        self.downtime += duration
 
     def check_alarms(self) -> bool:
         """Check for alarm conditions"""
@@ -305,40 +658,32 @@ class BandSawSimulator:
             elif self.coolant_level <= 10:
                 self.set_alarm(AlarmType.COOLANT_LOW)
                 return True
-            elif random.random() < 0.001:  # Random material jam
-                self.set_alarm(AlarmType.MATERIAL_JAM)
-                return True
         return False
 
-    def handle_break_in(self):
+    def handle_break_in(self, dt: float, current_time: datetime):
         """Handle blade break-in process"""
         if self.break_in_pieces < 5:
             self.cutting_speed = self.recommended_cutting_speed * 0.7
             self.feed_rate = self.recommended_feed_rate * 0.6
-            self.process_piece()
-            self.break_in_pieces += 1
+            self.break_in_pieces += self.advance_production(dt, current_time)
         else:
             self.state = MachineState.INACTIVE
             self.break_in_pieces = 0
             self.blade_wear = 0.0
 
     def calculate_oee(self) -> Dict[str, float]:
-        """Calculate Overall Equipment Effectiveness metrics"""
-        current_time = datetime.now()
-        total_time = (current_time - self.start_time).total_seconds() / 3600
+        """Calculate Overall Equipment Effectiveness metrics (each 0-100%)"""
+        production_time = self.production_time.total_seconds()
+        operating_time = max(0.0, production_time - self.downtime.total_seconds())
 
-        # Availability
-        planned_production_time = total_time - (self.downtime.total_seconds() / 3600)
-        availability = (planned_production_time / total_time) if total_time > 0 else 0
+        # Availability: share of the production time not lost to stops
+        availability = operating_time / production_time if production_time > 0 else 0
 
-        # Performance
-        ideal_cycle_time = 60 / self.recommended_feed_rate if self.recommended_feed_rate > 0 else 0
-        theoretical_output = (planned_production_time * 3600) / ideal_cycle_time if ideal_cycle_time > 0 else 0
-        performance = (self.pieces / theoretical_output) if theoretical_output > 0 else 0
+        # Performance: ideal cutting time of the attempted pieces over the operating time
+        performance = min(1.0, self.ideal_cutting_time / operating_time) if operating_time > 0 else 0
 
-        # Quality
-        quality = ((self.pieces - self.scrap_pieces) / self.total_pieces_attempted
-                   if self.total_pieces_attempted > 0 else 1)
+        # Quality: pieces only counts good pieces
+        quality = self.pieces / self.total_pieces_attempted if self.total_pieces_attempted > 0 else 1
 
         return {
             "availability": availability * 100,
@@ -348,22 +693,32 @@ class BandSawSimulator:
         }
 
     def set_alarm(self, alarm_type: AlarmType):
-        """Set alarm state"""
+        """Set alarm state, clearing a different alarm that was still active"""
+        previous_alarm = self.alarm
+        if previous_alarm not in (AlarmType.NONE, alarm_type):
+            for listener in self.alarm_listeners:
+                listener(previous_alarm, False)
         self.alarm = alarm_type
         self.state = MachineState.ALARM
-        self.last_state_change = datetime.now()
+        self.last_state_change = self.now()
+        for listener in self.alarm_listeners:
+            listener(alarm_type, True)
 
     def reset_alarm(self):
             """Reset alarm state and return to inactive state"""
+            previous_alarm = self.alarm
             self.alarm = AlarmType.NONE
             self.state = MachineState.INACTIVE
-            self.last_state_change = datetime.now()
+            self.last_state_change = self.now()
+            if previous_alarm != AlarmType.NONE:
+                for listener in self.alarm_listeners:
+                    listener(previous_alarm, False)
 
     def perform_maintenance(self):
             """Perform maintenance tasks and reset wear indicators"""
             self.blade_wear = 0.0
             self.coolant_level = 100.0
-            self.last_maintenance = datetime.now()
+            self.last_maintenance = self.now()
             self.temperature = 20.0
             self.reset_alarm()
             return True
@@ -372,6 +727,13 @@ class BandSawSimulator:
                                    feed_rate: Optional[float] = None,
                                    cutting_angle: Optional[float] = None):
             """Set custom cutting parameters with validation"""
+            if cutting_angle is not None:
+                # Validate angle (0°, 45°, 60°)
+                valid_angles = [0, 45, 60]
+                self.cutting_angle = min(valid_angles, key=lambda x: abs(x - cutting_angle))
+                # Speed and feed are checked against the recommendations for the new angle
+                self.update_recommended_parameters()
+
             if cutting_speed is not None:
                 # Allow ±20% from recommended speed
                 min_speed = self.recommended_cutting_speed * 0.8
@@ -384,11 +746,6 @@ class BandSawSimulator:
                 max_feed = self.recommended_feed_rate * 1.2
                 self.feed_rate = max(min_feed, min(max_feed, feed_rate))
 
-            if cutting_angle is not None:
-                # Validate angle (0°, 45°, 60°)
-                valid_angles = [0, 45, 60]
-                self.cutting_angle = min(valid_angles, key=lambda x: abs(x - cutting_angle))
-
             # Update recommended parameters after changes
             self.update_recommended_parameters()
             return True
@@ -400,7 +757,7 @@ class BandSawSimulator:
             if material and material in materials_data:
                 self.material = material
 
-            if section and section in ["<100mm", "100-400mm"]:
+            if section and section in SECTIONS:
                 self.section = section
 
             if section_type and isinstance(section_type, SectionType):
@@ -415,7 +772,7 @@ class BandSawSimulator:
                 self.state = MachineState.BREAK_IN
                 self.break_in_pieces = 0
                 self.blade_wear = 0.0
-                self.last_state_change = datetime.now()
+                self.last_state_change = self.now()
                 return True
             return False
 
@@ -431,7 +788,7 @@ class BandSawSimulator:
                 "production_metrics": {
                     "total_pieces": self.pieces,
                     "scrap_pieces": self.scrap_pieces,
-                    "quality_rate": ((self.pieces - self.scrap_pieces) / self.total_pieces_attempted * 100)
+                    "quality_rate": (self.pieces / self.total_pieces_attempted * 100)
                     if self.total_pieces_attempted > 0 else 100,
                     "pieces_per_hour": self.pieces_per_hour
                 },
@@ -1,13 +1,18 @@
-from asyncua import Client
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 import logging
 
 
+NAMESPACE_URI = "http://examples/bandsaw"
+
+
 class OPCUAClient:
     def __init__(self, url="opc.tcp://localhost:4841/freeopcua/server/"):
         self.url = url
         self.client = None
+        self._nodes = {}  # Nome variabile BandSaw (o NodeId in stringa) -> Node, valido per la connessione corrente
+        self._variant_types = {}  # Nome variabile BandSaw -> VariantType, per scrivere con il tipo del server
+        self._namespace_index = None  # Indice del namespace BandSaw sulla connessione corrente
         self._lock = asyncio.Lock()  # Lock per evitare corse concorrenti
         self.executor = ThreadPoolExecutor(max_workers=1)  # Limita a una sola connessione
         self.loop = None
@@ -16,48 +21,128 @@ class OPCUAClient:
         """Garantisce che il client sia connesso al server OPCUA."""
         async with self._lock:
             if self.client is None:
+                # Import differito: asyncua pesa all'avvio e serve solo alla prima connessione
+                from asyncua import Client
                 try:
                     self.client = Client(url=self.url)
+                    self._nodes = {}
+                    self._variant_types = {}
                     await self.client.connect()
+                    await self._index_bandsaw_nodes()
                     logging.info("Connesso al server OPCUA con successo!")
                 except Exception as e:
                     logging.error(f"Errore durante la connessione al server OPCUA: {e}")
-                    self.client = None
+                    await self._drop_connection()
                     raise e
 
+    async def _drop_connection(self):
+        """Chiude la connessione corrente (se possibile) e svuota le cache legate ad essa."""
+        client, self.client = self.client, None
+        self._nodes = {}
+        self._variant_types = {}
+        if client is not None:
+            try:
+                await client.disconnect()
+            except Exception:
+                pass  # Connessione già persa
+
+    async def _index_bandsaw_nodes(self):
+        """Esplora una sola volta l'oggetto BandSaw e indicizza le sue variabili (e i loro tipi) per nome."""
+        from asyncua import ua
+
+        idx = self._namespace_index = await self.client.get_namespace_index(NAMESPACE_URI)
+        machine = await self.client.nodes.objects.get_child(f"{idx}:BandSaw")
+        for ref in await machine.get_children_descriptions():
+            self._nodes[ref.BrowseName.Name] = self.client.get_node(ref.NodeId)
+
+        names = list(self._nodes)
+        data_types = await self.client.read_attributes([self._nodes[name] for name in names], ua.AttributeIds.DataType)
+        for name, data_type in zip(names, data_types):
+            self._variant_types[name] = ua.VariantType(data_type.Value.Value.Identifier)
+
+    def _variant(self, name, value):
+        """Converte un valore Python nella Variant del tipo dichiarato dal server (se noto)."""
+        from asyncua import ua
+
+        return ua.Variant(value, self._variant_types.get(name))
+
+    def _get_node(self, name):
+        """Restituisce il Node per nome di variabile BandSaw o NodeId in stringa, dalla cache.
+
+        Solleva KeyError per nomi sconosciuti che non sono nemmeno NodeId validi.
+        """
+        from asyncua import ua
+
+        node = self._nodes.get(name)
+        if node is None:
+            try:
+                node_id = ua.NodeId.from_string(name)
+            except ua.UaStringParsingError:
+                raise KeyError(f"Variabile BandSaw sconosciuta: {name}") from None
+            node = self._nodes[name] = self.client.get_node(node_id)
+        return node
+
     async def get_node_value(self, node_id):
-        """Ottiene il valore di un nodo specifico dal server OPCUA."""
+        """Ottiene il valore di un nodo (nome di variabile BandSaw o NodeId) dal server OPCUA."""
         try:
             await self._ensure_connection()
-            node = self.client.get_node(node_id)
+            node = self._get_node(node_id)
             value = await node.read_value()
             return value
+        except KeyError as e:
+            logging.error(e)
+            return None
         except Exception as e:
             logging.error(f"Errore durante il recupero del valore del nodo {node_id}: {e}")
-            self.client = None
+            await self._drop_connection()
             return None
 
     async def set_node_value(self, node_id, value):
-        """Imposta un valore a un nodo specifico sul server OPCUA."""
+        """Imposta un valore a un nodo (nome di variabile BandSaw o NodeId) sul server OPCUA."""
         try:
             await self._ensure_connection()
-            node = self.client.get_node(node_id)
-            await node.write_value(value)
+            node = self._get_node(node_id)
+            await node.write_value(self._variant(node_id, value))
             return True
+        except KeyError as e:
+            logging.error(e)
+            return False
         except Exception as e:
             logging.error(f"Errore durante l'impostazione del valore del nodo {node_id}: {e}")
-            self.client = None
+            await self._drop_connection()
+            return False
+
+    async def set_node_values(self, values):
+        """Imposta più valori (nome o NodeId -> valore) con una sola chiamata Write.
+
+        Il server applica l'intera richiesta al simulatore in un unico passo.
+        """
+        try:
+            await self._ensure_connection()
+            nodes = [self._get_node(node_id) for node_id in values]
+            variants = [self._variant(node_id, value) for node_id, value in values.items()]
+            results = await self.client.write_values(nodes, variants, raise_on_partial_error=False)
+            for node_id, result in zip(values, results):
+                if not result.is_good():
+                    logging.error(f"Scrittura rifiutata per il nodo {node_id}: {result.name}")
+            return all(result.is_good() for result in results)
+        except KeyError as e:
+            logging.error(e)
+            return False
+        except Exception as e:
+            logging.error(f"Errore durante l'impostazione dei valori {list(values)}: {e}")
+            await self._drop_connection()
             return False
 
     async def get_machine_status(self):
         """Recupera lo stato della macchina dal server OPCUA."""
         try:
-            state = await self.get_node_value("ns=2;i=2")  # Stato della macchina
-            cutting_speed = await self.get_node_value("ns=2;i=3")  # Velocità di taglio
-            feed_rate = await self.get_node_value("ns=2;i=4")  # Velocità di avanzamento
-            pieces = await self.get_node_value("ns=2;i=5")  # Pezzi tagliati
-            power_consumption = await self.get_node_value("ns=2;i=6")  # Consumo di energia
-            temperature = await self.get_node_value("ns=2;i=7")  # Temperatura
+            state = await self.get_node_value("State")  # Stato della macchina
+            cutting_speed = await self.get_node_value("CuttingSpeed")  # Velocità di taglio
+            feed_rate = await self.get_node_value("FeedRate")  # Velocità di avanzamento
+            pieces = await self.get_node_value("Pieces")  # Pezzi tagliati
+            power_consumption = await self.get_node_value("PowerConsumption")  # Consumo di energia
+            temperature = await self.get_node_value("Temperature")  # Temperatura
 
             return {
                 'state': state,
@@ -71,6 +156,26 @@ class OPCUAClient:
             logging.error(f"Errore durante il recupero dello stato macchina: {e}")
             return {}
 
+    async def get_alarm_events(self, since=None, limit=0):
+        """Recupera lo storico degli eventi di allarme dal server OPCUA (dal più vecchio)."""
+        try:
+            await self._ensure_connection()
+            event_type = await self.client.nodes.base_event_type.get_child(
+                f"{self._namespace_index}:BandSawAlarmEventType")
+            events = await self.client.nodes.server.read_event_history(starttime=since, numvalues=limit, evtypes=event_type)
+            return [{
+                'time': event.Time.isoformat(),
+                'alarm_type': event.AlarmType,
+                'active': event.Active,
+                'count': event.Count,
+                'severity': event.Severity,
+                'message': event.Message.Text
+            } for event in sorted(events, key=lambda event: event.Time)]
+        except Exception as e:
+            logging.error(f"Errore durante il recupero degli eventi di allarme: {e}")
+            await self._drop_connection()
+            return None
+
     def run_async(self, coro):
         """Esegue una coroutine asincrona nel thread principale (sincrono)."""
         if self.loop is None:  # Se manca un event loop ne crea uno nuovo
@@ -1,14 +1,297 @@
 import asyncio
-from datetime import datetime
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from importlib import metadata
+from pathlib import Path
+from typing import Optional
 from asyncua import Server, ua
+from asyncua.common.callback import CallbackType
 from backend.bandsaw_simulator import (
-    BandSawSimulator, MachineState, AlarmType, SectionType
+    BandSawSimulator, MachineState, AlarmType, SectionType, invalid_settings
 )
+from backend.recorder import ValuePlayer, ValueRecorder, TYPE_DOUBLE, TYPE_INT64, TYPE_STRING
+from backend.alarm_events import AlarmEventQueue, publish_alarm_events
+from backend.publishing import PublishingPolicy, ValuePublisher, limit_subscriptions
 
 
-async def main():
+# Variables published under the BandSaw object. Each gets the string NodeId
+# ns=<idx>;s=BandSaw.<name>, so ids do not depend on creation order.
+BANDSAW_VARIABLES = [
+    ("State", ua.VariantType.String),
+    ("AlarmType", ua.VariantType.String),
+    ("Pieces", ua.VariantType.Int64),
+    ("ScrapPieces", ua.VariantType.Int64),
+    ("PiecesPerHour", ua.VariantType.Double),
+    ("Material", ua.VariantType.String),
+    ("Section", ua.VariantType.String),
+    ("SectionType", ua.VariantType.String),
+    ("CuttingAngle", ua.VariantType.Double),
+    ("CuttingSpeed", ua.VariantType.Double),
+    ("FeedRate", ua.VariantType.Double),
+    ("RecommendedSpeed", ua.VariantType.Double),
+    ("RecommendedFeedRate", ua.VariantType.Double),
+    ("Temperature", ua.VariantType.Double),
+    ("PowerConsumption", ua.VariantType.Double),
+    ("BladeWear", ua.VariantType.Double),
+    ("CoolantLevel", ua.VariantType.Double),
+]
+
+# Alarm transitions kept in the server event history
+ALARM_HISTORY_SIZE = 1000
+
+# Variables clients may write to
+WRITABLE_VARIABLES = {
+    "State", "AlarmType", "Material", "Section",
+    "SectionType", "CuttingAngle", "CuttingSpeed", "FeedRate",
+}
+
+# Writable variables -> setting names checked by invalid_settings
+_SETTING_NAMES = {
+    "State": "state", "AlarmType": "alarm", "Material": "material", "Section": "section",
+    "SectionType": "section_type", "CuttingSpeed": "cutting_speed", "FeedRate": "feed_rate",
+    "CuttingAngle": "cutting_angle",
+}
+
+_RECORD_TYPES = {
+    ua.VariantType.String: TYPE_STRING,
+    ua.VariantType.Int64: TYPE_INT64,
+    ua.VariantType.Double: TYPE_DOUBLE,
+}
+
+
+def published_values(simulator: BandSawSimulator) -> dict:
+    """Current simulator values keyed by BandSaw variable name"""
+    return {
+        "State": simulator.state.value,
+        "AlarmType": simulator.alarm.value,
+        "Pieces": simulator.pieces,
+        "ScrapPieces": simulator.scrap_pieces,
+        "PiecesPerHour": float(simulator.pieces_per_hour),
+        "Material": simulator.material,
+        "Section": simulator.section,
+        "SectionType": simulator.section_type.value,
+        "CuttingAngle": float(simulator.cutting_angle),
+        "CuttingSpeed": float(simulator.cutting_speed),
+        "FeedRate": float(simulator.feed_rate),
+        "RecommendedSpeed": float(simulator.recommended_cutting_speed),
+        "RecommendedFeedRate": float(simulator.recommended_feed_rate),
+        "Temperature": float(simulator.temperature),
+        "PowerConsumption": float(simulator.consumption),
+        "BladeWear": float(simulator.blade_wear),
+        "CoolantLevel": float(simulator.coolant_level),
+    }
+
+
+def address_space_cache_dir() -> Path:
+    """Location of the prebuilt standard address space, per user, asyncua and Python version"""
+    version = f"{metadata.version('asyncua')}-py{sys.version_info[0]}{sys.version_info[1]}"
+    cache_home = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    return cache_home / "bandsaw" / f"aspace-{version}"
+
+
+def _is_private_dir(path: Path) -> bool:
+    """True if path is a directory owned by this user that nobody else can write to"""
+    st = path.stat()
+    if not stat.S_ISDIR(st.st_mode):
+        return False
+    if hasattr(os, "getuid"):
+        return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+    return True
+
+
+async def init_server(cache_dir: Optional[Path] = None) -> Server:
+    """Create and initialize the server, reusing a cached standard address space.
+
+    Building the standard address space is most of the cold start. The first
+    start saves it as a shelf in cache_dir and later starts load it lazily.
+    The shelf is a pickle, so it is only used from a directory private to the
+    current user; otherwise, or if loading fails, the address space is built
+    from scratch.
+    """
     server = Server()
-    await server.init()
+    if cache_dir is None:
+        await server.init()
+        return server
+
+    try:
+        cache_dir.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        private = _is_private_dir(cache_dir.parent) and (not cache_dir.exists() or _is_private_dir(cache_dir))
+    except OSError:
+        private = False
+    if not private:
+        print(f"Address space cache {cache_dir} is not private to this user, not using it")
+        await server.init()
+        return server
+
+    shelf = cache_dir / "aspace"
+    if shelf.is_file() or shelf.with_suffix(".db").is_file():
+        try:
+            await server.init(shelf)
+            await server.nodes.server.read_browse_name()  # The shelf is read lazily, probe it once
+            return server
+        except Exception as e:
+            print(f"Cannot load address space cache {cache_dir} ({e}), rebuilding it")
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            server = Server()
+
+    # Build in a private directory and publish it with an atomic rename, so
+    # servers starting in parallel never read a half written cache
+    build_dir = Path(tempfile.mkdtemp(prefix=f"{cache_dir.name}-", dir=cache_dir.parent))
+    build_shelf = build_dir / "aspace"
+    await server.init(build_shelf)
+    if not build_shelf.is_file() and not build_shelf.with_suffix(".db").is_file():
+        # dbm.dumb writes aspace.dat/.dir, but asyncua looks for the shelf path itself
+        build_shelf.touch()
+    try:
+        build_dir.rename(cache_dir)
+    except OSError:
+        shutil.rmtree(build_dir, ignore_errors=True)  # Another server published it first
+    return server
+
+
+async def add_bandsaw_nodes(server: Server, idx: int, simulator: BandSawSimulator):
+    """Create the BandSaw object and all its variables with a single AddNodes call.
+
+    Node ids are deterministic strings: "BandSaw" and "BandSaw.<variable>".
+
+    Returns the object node and a name -> variable node mapping.
+    """
+    objects = server.nodes.objects
+    machine_id = ua.NodeId("BandSaw", idx)
+
+    machine_item = ua.AddNodesItem()
+    machine_item.RequestedNewNodeId = machine_id
+    machine_item.BrowseName = ua.QualifiedName("BandSaw", idx)
+    machine_item.ParentNodeId = objects.nodeid
+    machine_item.ReferenceTypeId = ua.NodeId(ua.ObjectIds.Organizes)
+    machine_item.NodeClass = ua.NodeClass.Object
+    machine_item.TypeDefinition = ua.NodeId(ua.ObjectIds.BaseObjectType)
+    machine_attrs = ua.ObjectAttributes()
+    machine_attrs.DisplayName = ua.LocalizedText("BandSaw")
+    machine_attrs.Description = ua.LocalizedText("BandSaw")
+    machine_item.NodeAttributes = machine_attrs
+    items = [machine_item]
+
+    initial_values = published_values(simulator)
+    for name, variant_type in BANDSAW_VARIABLES:
+        access = ua.AccessLevel.CurrentRead.mask
+        if name in WRITABLE_VARIABLES:
+            access |= ua.AccessLevel.CurrentWrite.mask
+
+        attrs = ua.VariableAttributes()
+        attrs.DisplayName = ua.LocalizedText(name)
+        attrs.Description = ua.LocalizedText(name)
+        attrs.DataType = ua.NodeId(variant_type.value)
+        attrs.Value = ua.Variant(initial_values[name], variant_type)
+        attrs.ValueRank = ua.ValueRank.Scalar
+        attrs.AccessLevel = access
+        attrs.UserAccessLevel = access
+
+        item = ua.AddNodesItem()
+        item.RequestedNewNodeId = ua.NodeId(f"BandSaw.{name}", idx)
+        item.BrowseName = ua.QualifiedName(name, idx)
+        item.ParentNodeId = machine_id
+        item.ReferenceTypeId = ua.NodeId(ua.ObjectIds.HasComponent)
+        item.NodeClass = ua.NodeClass.Variable
+        item.TypeDefinition = ua.NodeId(ua.ObjectIds.BaseDataVariableType)
+        item.NodeAttributes = attrs
+        items.append(item)
+
+    results = await objects.session.add_nodes(items)
+    for result in results:
+        result.StatusCode.check()
+
+    machine = server.get_node(machine_id)
+    variables = {name: server.get_node(result.AddedNodeId)
+                 for (name, _), result in zip(BANDSAW_VARIABLES, results[1:])}
+    return machine, variables
+
+
+def apply_client_values(simulator: BandSawSimulator, values: dict) -> bool:
+    """Apply a batch of client writes (variable name -> value) to the simulator.
+
+    Runs without awaiting, so the whole batch lands between two simulator ticks.
+    Every value is validated first; if any is invalid nothing is applied and
+    False is returned. The alarm is applied before the state, so a reset does
+    not override a state requested in the same batch, and material and section
+    before the cutting parameters, which are validated against the
+    recommendations for the new material.
+    """
+    invalid = invalid_settings({_SETTING_NAMES[name]: value for name, value in values.items()
+                                if name in _SETTING_NAMES})
+    if invalid:
+        print(f"Invalid values received for {', '.join(invalid)}, ignoring: {values}")
+        return False
+
+    new_alarm = values.get("AlarmType")
+    if new_alarm is not None and new_alarm != simulator.alarm.value:
+        alarm = AlarmType(new_alarm)
+        if alarm == AlarmType.NONE:
+            simulator.reset_alarm()
+        else:
+            simulator.set_alarm(alarm)
+
+    new_state = values.get("State")
+    if new_state is not None and new_state != simulator.state.value:
+        simulator.state = MachineState(new_state)
+        simulator.last_state_change = simulator.now()
+        print(f"State changed to: {new_state}")
+
+    if {"Material", "Section", "SectionType"} & values.keys():
+        section_type = SectionType(values["SectionType"]) if "SectionType" in values else None
+        simulator.set_material_parameters(
+            material=values.get("Material"),
+            section=values.get("Section"),
+            section_type=section_type
+        )
+
+    if {"CuttingSpeed", "FeedRate", "CuttingAngle"} & values.keys():
+        simulator.set_cutting_parameters(
+            cutting_speed=values.get("CuttingSpeed"),
+            feed_rate=values.get("FeedRate"),
+            cutting_angle=values.get("CuttingAngle")
+        )
+    return True
+
+
+async def write_values(variables: dict, values: dict):
+    """Write a name -> value mapping to the matching OPC-UA variables"""
+    for name, value in values.items():
+        await variables[name].write_value(value)
+
+
+async def playback(value_publisher: ValuePublisher, path: str, speed: Optional[float] = 1.0, start: float = 0.0):
+    """Serve a recorded value stream instead of the simulated physics.
+
+    Values go through the publisher like simulated ones, so subscribers see the
+    same sampling and coalescing whatever the playback speed.
+    """
+    with ValuePlayer(path) as player:
+        print(f"Playing back {len(player)} records ({player.duration:.1f}s) from {path} at "
+              f"{f'{speed}x' if speed else 'max speed'}")
+        value_publisher.update(player.seek(start))
+        async for _, values in player.play(speed):
+            value_publisher.update(values)
+    print("Playback finished")
+
+
+async def main(record_path: Optional[str] = None, playback_path: Optional[str] = None,
+               playback_speed: Optional[float] = 1.0, playback_start: float = 0.0,
+               address_space_cache: bool = True, publishing_policy: Optional[PublishingPolicy] = None):
+    if playback_path:
+        try:
+            ValuePlayer(playback_path).close()
+        except (OSError, ValueError) as e:
+            print(f"Cannot play back {playback_path}: {e}")
+            return
+
+    startup_begin = time.perf_counter()
+    server = await init_server(address_space_cache_dir() if address_space_cache else None)
+    init_done = time.perf_counter()
 
     url = "opc.tcp://localhost:4841/freeopcua/server/"
     server.set_endpoint(url)
@@ -17,120 +300,114 @@ async def main():
     uri = "http://examples/bandsaw"
     idx = await server.register_namespace(uri)
 
-    objects = server.nodes.objects
-    machine = await objects.add_object(idx, "BandSaw")
-
     # Initialize simulator
     simulator = BandSawSimulator()
 
-    # Basic machine state variables
-    state_var = await machine.add_variable(idx, "State", simulator.state.value, ua.VariantType.String)
-    alarm_type_var = await machine.add_variable(idx, "AlarmType", simulator.alarm.value, ua.VariantType.String)
-
-    # Production parameters
-    pieces_var = await machine.add_variable(idx, "Pieces", simulator.pieces, ua.VariantType.Int64)
-    scrap_pieces_var = await machine.add_variable(idx, "ScrapPieces", simulator.scrap_pieces, ua.VariantType.Int64)
-    pieces_per_hour_var = await machine.add_variable(idx, "PiecesPerHour", simulator.pieces_per_hour,
-                                                     ua.VariantType.Double)
-
-    # Machine parameters
-    material_var = await machine.add_variable(idx, "Material", simulator.material, ua.VariantType.String)
-    section_var = await machine.add_variable(idx, "Section", simulator.section, ua.VariantType.String)
-    section_type_var = await machine.add_variable(idx, "SectionType", simulator.section_type.value,
-                                                  ua.VariantType.String)
-    cutting_angle_var = await machine.add_variable(idx, "CuttingAngle", simulator.cutting_angle, ua.VariantType.Double)
-
-    # Cutting parameters
-    cutting_speed_var = await machine.add_variable(idx, "CuttingSpeed", simulator.cutting_speed, ua.VariantType.Double)
-    feed_rate_var = await machine.add_variable(idx, "FeedRate", simulator.feed_rate, ua.VariantType.Double)
-    recommended_speed_var = await machine.add_variable(idx, "RecommendedSpeed", simulator.recommended_cutting_speed,
-                                                       ua.VariantType.Double)
-    recommended_feed_var = await machine.add_variable(idx, "RecommendedFeedRate", simulator.recommended_feed_rate,
-                                                      ua.VariantType.Double)
-
-    # Machine health
-    temp_var = await machine.add_variable(idx, "Temperature", simulator.temperature, ua.VariantType.Double)
-    consumption_var = await machine.add_variable(idx, "PowerConsumption", simulator.consumption, ua.VariantType.Double)
-    blade_wear_var = await machine.add_variable(idx, "BladeWear", simulator.blade_wear, ua.VariantType.Double)
-    coolant_level_var = await machine.add_variable(idx, "CoolantLevel", simulator.coolant_level, ua.VariantType.Double)
-
-    # Make variables writable
-    writable_vars = [
-        state_var, alarm_type_var, material_var, section_var,
-        section_type_var, cutting_angle_var, cutting_speed_var, feed_rate_var
-    ]
-    for var in writable_vars:
-        await var.set_writable()
-
-    print(f"OPC-UA Server started at {url}")
+    machine, variables = await add_bandsaw_nodes(server, idx, simulator)
+
+    # Alarm transitions are emitted as events with the BandSaw object as source. They
+    # go out through the Server object, which is also the node historizing them.
+    alarm_event_type = await server.create_custom_event_type(
+        idx, "BandSawAlarmEventType", ua.ObjectIds.BaseEventType, [
+            ("AlarmType", ua.VariantType.String),
+            ("Active", ua.VariantType.Boolean),
+            ("Count", ua.VariantType.UInt32),
+        ])
+    alarm_event_generator = await server.get_event_generator(alarm_event_type)
+    alarm_event_generator.event.SourceNode = machine.nodeid
+    alarm_event_generator.event.SourceName = "BandSaw"
+    alarm_events = AlarmEventQueue()
+    simulator.alarm_listeners.append(alarm_events.push)
+
+    # The simulation tick hands values to the publisher and never waits on
+    # subscribers; slow clients only lose intermediate values
+    publishing_policy = publishing_policy or PublishingPolicy()
+    subscription_stats = limit_subscriptions(server, publishing_policy)
+    value_publisher = ValuePublisher(variables, publishing_policy, subscription_stats)
+
+    recorder = None
+    if record_path:
+        recorder = ValueRecorder(record_path, [(name, _RECORD_TYPES[t]) for name, t in BANDSAW_VARIABLES])
+        print(f"Recording BandSaw values to {record_path}")
+
+    variable_names = {var.nodeid: name for name, var in variables.items()}
+
+    async def apply_client_writes(event, dispatcher):
+        """Apply each client Write request to the simulator as one batch, as soon as it completes.
 
+        Quick alarm set/reset cycles are not lost between ticks, and a multi-value
+        setup is never seen half-applied by the simulation. If any BandSaw value
+        in the request was rejected, none is applied and the published values
+        are restored.
+        """
+        if not event.is_external:
+            return
+        written = {}
+        rejected = False
+        for write_value, status in zip(event.request_params.NodesToWrite, event.response_params):
+            name = variable_names.get(write_value.NodeId)
+            if name is None or write_value.AttributeId != ua.AttributeIds.Value:
+                continue
+            if status.is_good():
+                written[name] = write_value.Value.Value.Value
+            else:
+                rejected = True
+        if not written:
+            return
+        if rejected:
+            print(f"Write request partially rejected, ignoring: {written}")
+        else:
+            apply_client_values(simulator, written)  # Restores the published values if invalid
+        values = published_values(simulator)
+        await value_publisher.write(values)
+        if recorder:
+            recorder.record(values)
+        await alarm_events.flush()
+
+    if not playback_path:
+        server.subscribe_server_callback(CallbackType.PostWrite, apply_client_writes)
+
+    address_space_done = time.perf_counter()
+
+    publisher = None
+    value_publisher_task = None
     try:
         async with server:
-            while True:
-                # Handle state changes
-                new_state = await state_var.get_value()
-                if new_state != simulator.state.value:
-                    try:
-                        simulator.state = MachineState(new_state)
-                        simulator.last_state_change = datetime.now()
-                        print(f"State changed to: {new_state}")
-                    except ValueError:
-                        print(f"Invalid state received: {new_state}")
-
-                # Handle alarm changes
-                new_alarm = await alarm_type_var.get_value()
-                if new_alarm != simulator.alarm.value:
-                    try:
-                        simulator.alarm = AlarmType(new_alarm)
-                        if simulator.alarm != AlarmType.NONE:
-                            simulator.state = MachineState.ALARM
-                    except ValueError:
-                        print(f"Invalid alarm type received: {new_alarm}")
-
-                # Handle material parameter changes
-                new_material = await material_var.get_value()
-                new_section = await section_var.get_value()
-                new_section_type = await section_type_var.get_value()
-                if (new_material != simulator.material or
-                        new_section != simulator.section or
-                        new_section_type != simulator.section_type.value):
-                    simulator.set_material_parameters(
-                        material=new_material,
-                        section=new_section,
-                        section_type=SectionType(new_section_type)
-                    )
-
-                # Handle cutting parameter changes
-                new_speed = await cutting_speed_var.get_value()
-                new_feed = await feed_rate_var.get_value()
-                new_angle = await cutting_angle_var.get_value()
-                if (new_speed != simulator.cutting_speed or
-                        new_feed != simulator.feed_rate or
-                        new_angle != simulator.cutting_angle):
-                    simulator.set_cutting_parameters(
-                        cutting_speed=new_speed,
-                        feed_rate=new_feed,
-                        cutting_angle=new_angle
-                    )
+            ready = time.perf_counter()
+            print(f"OPC-UA Server started at {url}")
+            print(f"Startup: init {init_done - startup_begin:.3f}s, "
+                  f"address space {address_space_done - init_done:.3f}s, "
+                  f"listening {ready - address_space_done:.3f}s, "
+                  f"ready after {ready - startup_begin:.3f}s")
 
+            await server.historize_node_event(server.nodes.server, count=ALARM_HISTORY_SIZE)
+            publisher = asyncio.create_task(publish_alarm_events(alarm_events, alarm_event_generator))
+            value_publisher_task = asyncio.create_task(value_publisher.run())
+
+            if playback_path:
+                await playback(value_publisher, playback_path, playback_speed, playback_start)
+                # Keep serving the last played values until shutdown
+                await asyncio.Event().wait()
+
+            while True:
                 # Update simulator state
                 simulator.update_state()
+                await alarm_events.flush()
 
-                # Write all updated values back to OPC-UA server
-                await state_var.write_value(simulator.state.value)
-                await alarm_type_var.write_value(simulator.alarm.value)
-                await pieces_var.write_value(simulator.pieces)
-                await scrap_pieces_var.write_value(simulator.scrap_pieces)
-                await pieces_per_hour_var.write_value(float(simulator.pieces_per_hour)) #mettere float in questa var              await cutting_speed_var.write_value(simulator.cutting_speed)
-                await feed_rate_var.write_value(simulator.feed_rate)
-                await recommended_speed_var.write_value(simulator.recommended_cutting_speed)
-                await recommended_feed_var.write_value(simulator.recommended_feed_rate)
-                await temp_var.write_value(simulator.temperature)
-                await consumption_var.write_value(simulator.consumption)
-                await blade_wear_var.write_value(simulator.blade_wear)
-                await coolant_level_var.write_value(simulator.coolant_level)
+                # Hand the updated values to the OPC-UA publisher
+                values = published_values(simulator)
+                value_publisher.update(values)
+                if recorder:
+                    recorder.record(values)
 
                 await asyncio.sleep(1)
 
     except KeyboardInterrupt:
         print("\nShutdown signal received. Stopping server...")
+    finally:
+        if publisher:
+            publisher.cancel()
+        if value_publisher_task:
+            value_publisher_task.cancel()
+        if recorder:
+            recorder.close()
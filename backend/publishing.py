@@ -0,0 +1,256 @@
+import asyncio
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import asyncua
+from asyncua import Server, ua
+from asyncua.server.internal_subscription import InternalSubscription
+
+
+@dataclass
+class PublishingPolicy:
+    """Limits applied to client subscriptions on the BandSaw server"""
+    sampling_interval: float = 0.5  # s, fastest rate values reach the address space
+    min_publishing_interval: float = 500.0  # ms, faster requests are revised up to this
+    queue_size: int = 1  # Data change notifications kept per monitored item; 1 keeps the latest value only
+    event_queue_size: int = 64  # Events kept per event monitored item, oldest dropped first
+    max_unacked: int = 20  # Notification messages kept per subscription for Republish
+    report_interval: float = 60.0  # s between metrics reports, 0 to disable
+
+
+@dataclass
+class SubscriptionStats:
+    subscription_id: int
+    publishing_interval: float
+    coalesced: int = 0  # Data change notifications replaced by a newer value before being sent
+    dropped_events: int = 0  # Events discarded because the event queue was full
+    sampling_intervals: Dict[int, float] = field(default_factory=dict)  # Revised, ms by monitored item id
+    _subscription: Optional[weakref.ref] = field(default=None, repr=False)
+
+    @property
+    def queued(self) -> int:
+        """Notifications waiting for the client's next Publish request"""
+        subscription = self._subscription() if self._subscription else None
+        if subscription is None:
+            return 0
+        return (sum(len(items) for items in subscription._triggered_datachanges.values()) +
+                sum(len(items) for items in subscription._triggered_events.values()))
+
+
+def check_asyncua_internals(server: Server):
+    """Fail at startup if asyncua no longer has the internals limit_subscriptions() hooks into.
+
+    They are not part of the asyncua API; written against asyncua 2.1.
+    """
+    iserver = server.iserver
+    service = iserver.subscription_service
+    subscription = InternalSubscription(ua.CreateSubscriptionResult(), iserver.aspace, None, ua.NodeId())
+    required = [
+        (iserver, ["max_unacked_messages_per_subscription"]),
+        (service, ["create_subscription", "subscriptions"]),
+        (subscription, ["data", "max_queue_size", "enqueue_datachange_event", "enqueue_event",
+                        "_triggered_datachanges", "_triggered_events", "monitored_item_srv"]),
+        (subscription.monitored_item_srv, ["create_monitored_items"]),
+    ]
+    missing = [f"{type(obj).__name__}.{name}" for obj, names in required for name in names if not hasattr(obj, name)]
+    if missing:
+        raise RuntimeError(f"Publishing policy not supported by asyncua {asyncua.__version__}, "
+                           f"missing {', '.join(missing)}")
+
+
+def limit_subscriptions(server: Server, policy: PublishingPolicy) -> Dict[int, SubscriptionStats]:
+    """Apply the publishing policy to every subscription created by a client.
+
+    The asyncua server notifies subscribers synchronously on every write and
+    by default queues up to 10000 values per monitored item, so a client that
+    stops sending Publish requests holds on to memory that grows with the tick
+    rate. Client subscriptions get a minimum publishing interval and bounded
+    queues instead; a full data change queue keeps the newest value. Each
+    data change monitored item gets a revised sampling interval of at least
+    the policy's, and its changes are passed on at most once per interval,
+    latest value first.
+
+    Must be called before the server starts. Returns live statistics keyed by
+    subscription id. Server internal subscriptions (event history) are left alone.
+    """
+    check_asyncua_internals(server)
+    server.iserver.max_unacked_messages_per_subscription = policy.max_unacked
+    service = server.iserver.subscription_service
+    stats: Dict[int, SubscriptionStats] = {}
+    create_subscription = service.create_subscription
+
+    async def create_limited_subscription(params, callback, session_id, request_callback=None):
+        if request_callback is None:
+            return await create_subscription(params, callback, session_id, request_callback=request_callback)
+
+        params.RequestedPublishingInterval = max(params.RequestedPublishingInterval, policy.min_publishing_interval)
+        result = await create_subscription(params, callback, session_id, request_callback=request_callback)
+        subscription = service.subscriptions[result.SubscriptionId]
+        # Caps the revised queue size of new monitored items; data change
+        # queues are held to policy.queue_size below
+        subscription.max_queue_size = policy.event_queue_size
+
+        for subscription_id in [i for i in stats if i not in service.subscriptions]:
+            del stats[subscription_id]
+        subscription_stats = SubscriptionStats(result.SubscriptionId, result.RevisedPublishingInterval,
+                                               _subscription=weakref.ref(subscription))
+        stats[result.SubscriptionId] = subscription_stats
+
+        create_monitored_items = subscription.monitored_item_srv.create_monitored_items
+        enqueue_datachange_event = subscription.enqueue_datachange_event
+        enqueue_event = subscription.enqueue_event
+        sampling_intervals = subscription_stats.sampling_intervals
+        last_sampled: Dict[int, float] = {}
+        held: dict = {}  # Monitored item id -> (eventdata, maxsize) waiting for the next sample
+        releases = set()
+
+        async def create_sampled_monitored_items(params):
+            results = await create_monitored_items(params)
+            for item, item_result in zip(params.ItemsToCreate, results):
+                if (not item_result.StatusCode.is_good() or
+                        item.ItemToMonitor.AttributeId == ua.AttributeIds.EventNotifier):
+                    continue
+                requested = item.RequestedParameters.SamplingInterval
+                # A negative request means the publishing interval
+                revised = result.RevisedPublishingInterval if requested < 0 else requested
+                item_result.RevisedSamplingInterval = max(revised, policy.sampling_interval * 1000)
+                sampling_intervals[item_result.MonitoredItemId] = item_result.RevisedSamplingInterval
+            return results
+
+        async def sample(mid, eventdata, maxsize):
+            last_sampled[mid] = asyncio.get_running_loop().time()
+            maxsize = min(maxsize, policy.queue_size) if maxsize else policy.queue_size
+            if len(subscription._triggered_datachanges.get(mid, ())) >= maxsize:
+                subscription_stats.coalesced += 1
+            await enqueue_datachange_event(mid, eventdata, maxsize)
+
+        def release(mid):
+            if mid in held and service.subscriptions.get(result.SubscriptionId) is subscription:
+                task = asyncio.ensure_future(sample(mid, *held.pop(mid)))
+                releases.add(task)
+                task.add_done_callback(releases.discard)
+
+        async def enqueue_limited_datachange(mid, eventdata, maxsize):
+            # The first value of a new item is enqueued while it is being created, before it has an interval
+            interval = sampling_intervals.get(mid, 0) / 1000
+            loop = asyncio.get_running_loop()
+            due = last_sampled.get(mid, float("-inf")) + interval
+            if loop.time() >= due:
+                await sample(mid, eventdata, maxsize)
+                return
+            # Faster than the item's sampling interval: hold the latest value for the next sample
+            if mid in held:
+                subscription_stats.coalesced += 1
+            else:
+                loop.call_at(due, release, mid)
+            held[mid] = (eventdata, maxsize)
+
+        async def enqueue_counted_event(mid, eventdata, maxsize):
+            if maxsize and len(subscription._triggered_events.get(mid, ())) >= maxsize:
+                subscription_stats.dropped_events += 1
+            await enqueue_event(mid, eventdata, maxsize)
+
+        subscription.monitored_item_srv.create_monitored_items = create_sampled_monitored_items
+        subscription.enqueue_datachange_event = enqueue_limited_datachange
+        subscription.enqueue_event = enqueue_counted_event
+        return result
+
+    service.create_subscription = create_limited_subscription
+    return stats
+
+
+class ValuePublisher:
+    """Moves simulator values into the address space at the policy's sampling interval.
+
+    update() is called synchronously from the simulation tick and never waits
+    on OPC-UA: a value that has not been published yet is replaced by the
+    newer one, so however fast the simulation ticks, subscribers see at most
+    one change per variable and sampling interval. run() does the writes in
+    its own task.
+    """
+
+    def __init__(self, variables: dict, policy: PublishingPolicy,
+                 subscriptions: Optional[Dict[int, SubscriptionStats]] = None):
+        self.variables = variables
+        self.policy = policy
+        self.subscriptions = subscriptions if subscriptions is not None else {}
+        self._pending: dict = {}
+        self._ready = asyncio.Event()
+        self.published = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.write_time = 0.0  # s spent writing in flush()
+        self.max_write_latency = 0.0  # s, slowest flush()
+
+    def update(self, values: dict):
+        """Queue values for publishing, replacing unpublished ones"""
+        for name, value in values.items():
+            if name in self._pending and self._pending[name] != value:
+                self.coalesced += 1
+            self._pending[name] = value
+        self._ready.set()
+
+    async def write(self, values: dict):
+        """Publish values right away, superseding any pending ones"""
+        for name, value in values.items():
+            self._pending.pop(name, None)
+            await self.variables[name].write_value(value)
+            self.published += 1
+
+    async def flush(self):
+        """Publish pending values one by one, so a write() meanwhile always wins"""
+        started = time.perf_counter()
+        while self._pending:
+            name = next(iter(self._pending))
+            await self.variables[name].write_value(self._pending.pop(name))
+            self.published += 1
+        latency = time.perf_counter() - started
+        self.flushes += 1
+        self.write_time += latency
+        self.max_write_latency = max(self.max_write_latency, latency)
+
+    def metrics(self) -> dict:
+        return {
+            "published": self.published,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "write_latency_mean": self.write_time / self.flushes if self.flushes else 0.0,
+            "write_latency_max": self.max_write_latency,
+            "subscriptions": {
+                subscription_id: {
+                    "publishing_interval": stats.publishing_interval,
+                    "coalesced": stats.coalesced,
+                    "dropped_events": stats.dropped_events,
+                    "queued": stats.queued,
+                    "sampling_intervals": sorted(set(stats.sampling_intervals.values())),
+                }
+                for subscription_id, stats in self.subscriptions.items()
+            },
+        }
+
+    def report(self):
+        mean = self.write_time / self.flushes * 1000 if self.flushes else 0.0
+        print(f"Publishing: {self.published} values written, {self.coalesced} coalesced before sampling, "
+              f"write latency mean {mean:.2f}ms, max {self.max_write_latency * 1000:.2f}ms")
+        for subscription_id, stats in self.subscriptions.items():
+            print(f"  subscription {subscription_id} ({stats.publishing_interval:.0f}ms): "
+                  f"{stats.coalesced} coalesced, {stats.dropped_events} events dropped, {stats.queued} queued")
+
+    async def run(self):
+        last_report = time.monotonic()
+        last_counts = None
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            await self.flush()
+
+            if self.policy.report_interval and time.monotonic() - last_report >= self.policy.report_interval:
+                last_report = time.monotonic()
+                counts = (self.coalesced, [(s.coalesced, s.dropped_events) for s in self.subscriptions.values()])
+                if counts != last_counts:
+                    self.report()
+                    last_counts = counts
+
+            await asyncio.sleep(self.policy.sampling_interval)
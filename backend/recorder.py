@@ -0,0 +1,213 @@
+import asyncio
+import mmap
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+
+# File layout
+#   header : MAGIC, '<dH' start epoch + variable count,
+#            then per variable '<B' name length, name (utf-8), '<B' type code
+#   records: '<H' body length, then body = '<dB' offset from start (s) + variable index,
+#            followed by the value (double, int64 or raw utf-8 string)
+MAGIC = b"BSREC1\n"
+HEADER = struct.Struct("<dH")
+RECORD_LEN = struct.Struct("<H")
+RECORD_HEAD = struct.Struct("<dB")
+
+TYPE_DOUBLE = 0
+TYPE_INT64 = 1
+TYPE_STRING = 2
+
+_VALUE_STRUCTS = {
+    TYPE_DOUBLE: struct.Struct("<d"),
+    TYPE_INT64: struct.Struct("<q"),
+}
+
+
+class ValueRecorder:
+    """Append-only binary log of BandSaw variable changes.
+
+    Only values that differ from the last recorded one are written, so a
+    steady machine costs almost nothing to record. Each record() call is
+    flushed to the OS, so a killed process keeps everything recorded so far.
+    """
+
+    def __init__(self, path: str, variables: List[Tuple[str, int]]):
+        self.path = path
+        self.variables = variables
+        self._index = {name: i for i, (name, _) in enumerate(variables)}
+        self._last: Dict[str, object] = {}
+        self.start_time = time.time()
+
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._file.write(HEADER.pack(self.start_time, len(variables)))
+        for name, type_code in variables:
+            encoded = name.encode("utf-8")
+            self._file.write(struct.pack("<B", len(encoded)) + encoded + struct.pack("<B", type_code))
+        self._file.flush()
+
+    def record(self, values: Dict[str, object], timestamp: Optional[float] = None):
+        """Write the values that changed since the previous call"""
+        offset = (timestamp if timestamp is not None else time.time()) - self.start_time
+        chunks = []
+        for name, value in values.items():
+            if self._last.get(name, _MISSING) == value:
+                continue
+            self._last[name] = value
+            index = self._index[name]
+            body = RECORD_HEAD.pack(offset, index) + _encode_value(self.variables[index][1], value)
+            chunks.append(RECORD_LEN.pack(len(body)) + body)
+        if chunks:
+            self._file.write(b"".join(chunks))
+            self._file.flush()
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ValuePlayer:
+    """Memory-mapped reader for logs written by ValueRecorder"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = None
+        # mmap cannot map an empty file
+        if os.fstat(self._file.fileno()).st_size < len(MAGIC) + HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is empty or not a BandSaw recording")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a BandSaw recording")
+
+        pos = len(MAGIC)
+        self.start_time, count = HEADER.unpack_from(self._mm, pos)
+        pos += HEADER.size
+        self.variables: List[Tuple[str, int]] = []
+        try:
+            for _ in range(count):
+                name_len = self._mm[pos]
+                name = self._mm[pos + 1:pos + 1 + name_len].decode("utf-8")
+                type_code = self._mm[pos + 1 + name_len]
+                self.variables.append((name, type_code))
+                pos += name_len + 2
+        except (IndexError, UnicodeDecodeError):
+            self.close()
+            raise ValueError(f"{path} has a truncated header")
+
+        # One pass over the log to index record offsets and timestamps for seeking
+        self._offsets = array("Q")
+        self._times = array("d")
+        end = len(self._mm)
+        while pos + RECORD_LEN.size <= end:
+            (length,) = RECORD_LEN.unpack_from(self._mm, pos)
+            if pos + RECORD_LEN.size + length > end:
+                break  # truncated tail from an interrupted recording
+            self._offsets.append(pos)
+            self._times.append(RECORD_HEAD.unpack_from(self._mm, pos + RECORD_LEN.size)[0])
+            pos += RECORD_LEN.size + length
+
+        self.position = 0
+
+    def __len__(self):
+        return len(self._offsets)
+
+    @property
+    def duration(self) -> float:
+        return self._times[-1] if self._times else 0.0
+
+    def read(self, i: int) -> Tuple[float, str, object]:
+        """Decode record i as (offset seconds, variable name, value)"""
+        pos = self._offsets[i]
+        (length,) = RECORD_LEN.unpack_from(self._mm, pos)
+        pos += RECORD_LEN.size
+        offset, index = RECORD_HEAD.unpack_from(self._mm, pos)
+        payload = self._mm[pos + RECORD_HEAD.size:pos + length]
+        name, type_code = self.variables[index]
+        return offset, name, _decode_value(type_code, payload)
+
+    def seek(self, offset: float) -> Dict[str, object]:
+        """Move to the first record at or after offset seconds.
+
+        Returns the latest value of every variable before that point, so the
+        caller can restore the full state before resuming playback.
+        """
+        self.position = bisect_left(self._times, offset)
+        state = {}
+        for i in range(self.position):
+            _, name, value = self.read(i)
+            state[name] = value
+        return state
+
+    def __iter__(self) -> Iterator[Tuple[float, str, object]]:
+        while self.position < len(self._offsets):
+            record = self.read(self.position)
+            self.position += 1
+            yield record
+
+    async def play(self, speed: Optional[float] = 1.0) -> AsyncIterator[Tuple[float, Dict[str, object]]]:
+        """Yield (offset, changed values) batches paced at speed x real time.
+
+        A speed of None or 0 streams the log as fast as possible.
+        """
+        wall_start = time.monotonic()
+        log_start = self._times[self.position] if self.position < len(self._times) else 0.0
+        batch: Dict[str, object] = {}
+        batch_time = None
+        for offset, name, value in self:
+            if batch_time is not None and offset != batch_time:
+                yield batch_time, batch
+                batch = {}
+            if batch_time != offset and speed:
+                delay = (offset - log_start) / speed - (time.monotonic() - wall_start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            batch_time = offset
+            batch[name] = value
+        if batch:
+            yield batch_time, batch
+
+    def close(self):
+        if self._mm is not None and not self._mm.closed:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_MISSING = object()
+
+
+def _encode_value(type_code: int, value) -> bytes:
+    if type_code == TYPE_STRING:
+        return str(value).encode("utf-8")
+    if type_code == TYPE_INT64:
+        return _VALUE_STRUCTS[TYPE_INT64].pack(int(value))
+    return _VALUE_STRUCTS[TYPE_DOUBLE].pack(float(value))
+
+
+def _decode_value(type_code: int, payload: bytes):
+    if type_code == TYPE_STRING:
+        return payload.decode("utf-8")
+    return _VALUE_STRUCTS[type_code].unpack(payload)[0]
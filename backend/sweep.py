@@ -0,0 +1,214 @@
+"""Monte Carlo parameter sweep over headless BandSawSimulator runs.
+
+    python -m backend.sweep --output sweep.csv --pieces 200 --replicas 3
+    python -m backend.sweep --output sweep.csv --parquet sweep.parquet
+
+Every combination of material, section, section type, cutting angle and
+speed/feed factor (relative to the recommended parameters) is run on a
+process pool, each run with its own seed. Results are appended to the CSV as
+runs finish, so an interrupted sweep resumes where it stopped when started
+again with the same arguments.
+"""
+import argparse
+import csv
+import itertools
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from backend.bandsaw_simulator import (
+    BandSawSimulator, MachineState, AlarmType, SectionType, SECTIONS, materials_data
+)
+
+
+ANGLES = [0, 45, 60]
+FACTORS = [0.8, 0.9, 1.0, 1.1, 1.2]
+
+# Alarms cleared by maintenance (new blade, coolant top-up) rather than a plain reset
+MAINTENANCE_ALARMS = {AlarmType.BLADE_WEAR, AlarmType.COOLANT_LOW, AlarmType.HIGH_TEMPERATURE}
+
+# Simulated stop durations booked as downtime, so availability reflects alarm stops
+ALARM_STOP = timedelta(minutes=2)
+MAINTENANCE_STOP = timedelta(minutes=15)
+
+# Give up on runs whose settings keep the machine in alarm: simulated time
+# allowed per requested piece, in cycle times at the run's settings
+MAX_CYCLES_PER_PIECE = 50
+
+RESULT_FIELDS = [
+    "run_id", "seed", "material", "section", "section_type", "cutting_angle",
+    "speed_factor", "feed_factor", "cutting_speed", "feed_rate",
+    "pieces", "scrap_pieces", "scrap_rate", "wear_per_piece", "blade_life_pieces",
+    "energy_per_piece_wh", "availability", "performance", "quality", "oee",
+    "alarms", "maintenance_stops", "simulated_seconds",
+]
+
+Params = Tuple[int, int, str, str, str, int, float, float, int, float]
+
+
+def build_runs(base_seed: int, replicas: int, pieces: int, dt: float,
+               speed_factors: List[float], feed_factors: List[float]) -> Iterator[Params]:
+    """Enumerate the sweep grid; run ids and seeds depend only on the grid position"""
+    grid = itertools.product(materials_data, SECTIONS, [t.value for t in SectionType], ANGLES,
+                             speed_factors, feed_factors, range(replicas))
+    for run_id, (material, section, section_type, angle, speed_factor, feed_factor, _) in enumerate(grid):
+        yield (run_id, base_seed + run_id, material, section, section_type, angle,
+               speed_factor, feed_factor, pieces, dt)
+
+
+def simulate(params: Params) -> Dict:
+    """Run one headless simulation until the requested number of pieces has been cut"""
+    (run_id, seed, material, section, section_type, angle,
+     speed_factor, feed_factor, pieces, dt) = params
+    random.seed(seed)
+
+    simulator = BandSawSimulator(clock=datetime(2000, 1, 1))
+    simulator.set_material_parameters(material=material, section=section, section_type=SectionType(section_type))
+    simulator.set_cutting_parameters(cutting_angle=angle)
+    simulator.set_cutting_parameters(
+        cutting_speed=simulator.recommended_cutting_speed * speed_factor,
+        feed_rate=simulator.recommended_feed_rate * feed_factor
+    )
+    simulator.state = MachineState.RUNNING
+    time_limit = simulator.now() + timedelta(seconds=pieces * simulator.cycle_time() * MAX_CYCLES_PER_PIECE)
+
+    energy = 0.0  # Wh
+    total_wear = 0.0
+    alarms = 0
+    maintenance_stops = 0
+    while simulator.total_pieces_attempted < pieces and simulator.now() < time_limit:
+        wear_before = simulator.blade_wear
+        simulator.update_state(dt)
+        energy += simulator.consumption * dt / 3600
+        total_wear += max(0.0, simulator.blade_wear - wear_before)
+
+        if simulator.state == MachineState.ALARM:
+            alarms += 1
+            if simulator.alarm in MAINTENANCE_ALARMS:
+                simulator.perform_maintenance()
+                maintenance_stops += 1
+                stop = MAINTENANCE_STOP
+            else:
+                simulator.reset_alarm()
+                stop = ALARM_STOP
+            simulator.book_downtime(stop)
+            simulator.state = MachineState.RUNNING
+            simulator.consumption = simulator.calculate_power_consumption()
+
+    attempted = max(1, simulator.total_pieces_attempted)
+    wear_per_piece = total_wear / attempted
+    oee = simulator.calculate_oee()
+    return {
+        "run_id": run_id,
+        "seed": seed,
+        "material": material,
+        "section": section,
+        "section_type": section_type,
+        "cutting_angle": angle,
+        "speed_factor": speed_factor,
+        "feed_factor": feed_factor,
+        "cutting_speed": round(simulator.cutting_speed, 3),
+        "feed_rate": round(simulator.feed_rate, 4),
+        "pieces": simulator.pieces,
+        "scrap_pieces": simulator.scrap_pieces,
+        "scrap_rate": round(simulator.scrap_pieces / attempted, 4),
+        "wear_per_piece": round(wear_per_piece, 5),
+        # Pieces until the blade wear alarm threshold is reached
+        "blade_life_pieces": round(90 / wear_per_piece) if wear_per_piece > 0 else "",
+        "energy_per_piece_wh": round(energy / attempted, 5),
+        "availability": round(oee["availability"], 2),
+        "performance": round(oee["performance"], 2),
+        "quality": round(oee["quality"], 2),
+        "oee": round(oee["oee"], 2),
+        "alarms": alarms,
+        "maintenance_stops": maintenance_stops,
+        "simulated_seconds": round((simulator.now() - simulator.start_time).total_seconds()),
+    }
+
+
+def completed_runs(path: str) -> set:
+    """Run ids already present in a results file from an earlier, interrupted sweep.
+
+    A row cut short by the interruption has no value in the last column; it is
+    dropped from the file so that run is done again.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    complete = [row for row in rows if row.get(RESULT_FIELDS[-1])]
+    if len(complete) < len(rows):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(complete)
+    return {int(row["run_id"]) for row in complete}
+
+
+def export_parquet(csv_path: str, parquet_path: str):
+    try:
+        import pyarrow.csv
+        import pyarrow.parquet
+    except ImportError:
+        print("pyarrow is not installed, skipping Parquet export")
+        return
+    pyarrow.parquet.write_table(pyarrow.csv.read_csv(csv_path), parquet_path)
+    print(f"Results exported to {parquet_path}")
+
+
+def run_sweep(output: str, workers: Optional[int] = None, base_seed: int = 0, replicas: int = 1,
+              pieces: int = 200, dt: float = 1.0, speed_factors: List[float] = FACTORS,
+              feed_factors: List[float] = FACTORS, chunksize: int = 8) -> int:
+    """Run all pending sweep runs on a process pool, appending results to output. Returns runs executed."""
+    done = completed_runs(output)
+    pending = [params for params in build_runs(base_seed, replicas, pieces, dt, speed_factors, feed_factors)
+               if params[0] not in done]
+    if done:
+        print(f"Resuming: {len(done)} runs already in {output}, {len(pending)} to go")
+    if not pending:
+        return 0
+
+    write_header = not os.path.exists(output) or os.path.getsize(output) == 0
+    started = time.perf_counter()
+    with open(output, "a", newline="") as f, Pool(workers) as pool:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        if write_header:
+            writer.writeheader()
+        for count, result in enumerate(pool.imap_unordered(simulate, pending, chunksize=chunksize), start=1):
+            writer.writerow(result)
+            if count % 100 == 0 or count == len(pending):
+                f.flush()
+                elapsed = time.perf_counter() - started
+                print(f"{count}/{len(pending)} runs, {count / elapsed:.1f} runs/s")
+
+    elapsed = time.perf_counter() - started
+    print(f"Sweep finished: {len(pending)} runs in {elapsed:.1f}s ({len(pending) / elapsed:.1f} runs/s)")
+    return len(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo parameter sweep over the band saw simulator")
+    parser.add_argument("--output", default="sweep.csv", help="results CSV, also used to resume (default: sweep.csv)")
+    parser.add_argument("--parquet", metavar="PATH", help="also export the results to Parquet (needs pyarrow)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0, help="base seed; run i uses seed + i (default: 0)")
+    parser.add_argument("--replicas", type=int, default=1, help="runs per parameter combination (default: 1)")
+    parser.add_argument("--pieces", type=int, default=200, help="pieces cut per run (default: 200)")
+    parser.add_argument("--dt", type=float, default=1.0, help="simulated seconds per tick (default: 1)")
+    parser.add_argument("--speed-factors", type=float, nargs="+", default=FACTORS,
+                        help="cutting speeds to try, relative to the recommended one")
+    parser.add_argument("--feed-factors", type=float, nargs="+", default=FACTORS,
+                        help="feed rates to try, relative to the recommended one")
+    args = parser.parse_args()
+
+    run_sweep(args.output, workers=args.workers, base_seed=args.seed, replicas=args.replicas,
+              pieces=args.pieces, dt=args.dt, speed_factors=args.speed_factors, feed_factors=args.feed_factors)
+    if args.parquet:
+        export_parquet(args.output, args.parquet)
+
+
+if __name__ == "__main__":
+    main()
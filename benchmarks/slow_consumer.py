@@ -0,0 +1,169 @@
+"""Slow subscriber benchmark: simulation tick timing while clients fall behind.
+
+    python benchmarks/slow_consumer.py --tick-rate 50 --slow 2 --fast 2
+    python benchmarks/slow_consumer.py --tick-rate 50 --slow 2 --no-policy   # unbounded baseline
+
+Runs the simulator and an OPC-UA server in this process with a fast tick, and
+subscribes to every BandSaw variable from separate client processes. Slow
+consumers ask for immediate publishing and block in their handler, so they
+stop sending Publish requests. Reports tick lateness, the publisher task's
+write latency, the notifications queued for the clients and what the
+publishing policy coalesced. Without the policy the tick does the writes
+itself, so the tick duration is the write latency.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asyncua import Client, ua  # noqa: E402
+from backend.bandsaw_simulator import BandSawSimulator, MachineState  # noqa: E402
+from backend.opcua_server import (  # noqa: E402
+    BANDSAW_VARIABLES, add_bandsaw_nodes, address_space_cache_dir, init_server, published_values, write_values
+)
+from backend.publishing import PublishingPolicy, ValuePublisher, limit_subscriptions  # noqa: E402
+
+URL = "opc.tcp://localhost:4842/bandsaw-bench/"
+NAMESPACE_URI = "http://examples/bandsaw"
+
+
+class CountingHandler:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.notifications = 0
+
+    def datachange_notification(self, node, val, data):
+        self.notifications += 1
+        if self.delay:
+            time.sleep(self.delay)  # Blocks the client loop like a stalled link
+
+
+async def consume(interval: float, delay: float, duration: float, ready, results):
+    handler = CountingHandler(delay)
+    async with Client(URL) as client:
+        idx = await client.get_namespace_index(NAMESPACE_URI)
+        nodes = [client.get_node(ua.NodeId(f"BandSaw.{name}", idx)) for name, _ in BANDSAW_VARIABLES]
+        subscription = await client.create_subscription(interval, handler)
+        await subscription.subscribe_data_change(nodes)
+        ready.release()
+        await asyncio.sleep(duration)
+    results.put((delay > 0, handler.notifications))
+
+
+def consumer(interval, delay, duration, ready, results):
+    asyncio.run(consume(interval, delay, duration, ready, results))
+
+
+def queued_notifications(server) -> int:
+    subscriptions = server.iserver.subscription_service.subscriptions.values()
+    return sum(len(items) for subscription in subscriptions
+               for items in subscription._triggered_datachanges.values())
+
+
+async def run(args) -> dict:
+    server = await init_server(address_space_cache_dir())
+    server.set_endpoint(URL)
+    server.set_security_policy([ua.SecurityPolicyType.NoSecurity])
+    idx = await server.register_namespace(NAMESPACE_URI)
+    simulator = BandSawSimulator()
+    _, variables = await add_bandsaw_nodes(server, idx, simulator)
+
+    publisher = None
+    if not args.no_policy:
+        policy = PublishingPolicy(report_interval=0)
+        publisher = ValuePublisher(variables, policy, limit_subscriptions(server, policy))
+
+    context = multiprocessing.get_context("spawn")
+    ready = context.Semaphore(0)
+    results = context.Queue()
+    clients = [(500.0, 0.0)] * args.fast + [(0.0, args.delay)] * args.slow
+    processes = [context.Process(target=consumer, args=(interval, delay, args.duration, ready, results))
+                 for interval, delay in clients]
+
+    async with server:
+        publisher_task = asyncio.create_task(publisher.run()) if publisher else None
+        for process in processes:
+            process.start()
+        for _ in processes:
+            while not ready.acquire(block=False):
+                await asyncio.sleep(0.05)
+
+        period = 1 / args.tick_rate
+        simulator.state = MachineState.RUNNING
+        durations, lateness, peak_queued = [], [], 0
+        started = next_tick = time.perf_counter()
+        while time.perf_counter() - started < args.duration:
+            begin = time.perf_counter()
+            lateness.append(max(0.0, begin - next_tick))
+            simulator.update_state(period)
+            if simulator.state == MachineState.ALARM:
+                simulator.perform_maintenance()
+                simulator.state = MachineState.RUNNING
+            values = published_values(simulator)
+            if publisher:
+                publisher.update(values)
+            else:
+                await write_values(variables, values)
+            durations.append(time.perf_counter() - begin)
+            peak_queued = max(peak_queued, queued_notifications(server))
+
+            next_tick += period
+            await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+
+        metrics = publisher.metrics() if publisher else None
+
+        # Keep serving until the clients have disconnected
+        received = {True: [], False: []}
+        loop = asyncio.get_running_loop()
+        for _ in processes:
+            slow, count = await loop.run_in_executor(None, results.get, True, 60)
+            received[slow].append(count)
+        for process in processes:
+            process.join()
+        if publisher_task:
+            publisher_task.cancel()
+
+    return {"durations": durations, "lateness": lateness, "peak_queued": peak_queued,
+            "metrics": metrics, "received": received}
+
+
+def percentile(samples, fraction):
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tick-rate", type=float, default=50.0, help="simulation ticks per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run the simulation")
+    parser.add_argument("--fast", type=int, default=1, help="well-behaved subscribers (500ms publishing)")
+    parser.add_argument("--slow", type=int, default=2, help="slow subscribers (0ms publishing, blocking handler)")
+    parser.add_argument("--delay", type=float, default=0.5, help="seconds a slow subscriber blocks per notification")
+    parser.add_argument("--no-policy", action="store_true", help="write every tick directly, asyncua default limits")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    ms = [d * 1000 for d in result["durations"]]
+    late = [d * 1000 for d in result["lateness"]]
+    print(f"{'no policy' if args.no_policy else 'publishing policy'}: {len(ms)} ticks at {args.tick_rate:g}Hz, "
+          f"{args.fast} fast / {args.slow} slow subscribers")
+    print(f"tick duration: mean {statistics.mean(ms):.3f}ms, p99 {percentile(ms, 0.99):.3f}ms, max {max(ms):.3f}ms")
+    print(f"tick lateness: mean {statistics.mean(late):.3f}ms, p99 {percentile(late, 0.99):.3f}ms, "
+          f"max {max(late):.3f}ms")
+    print(f"peak queued notifications: {result['peak_queued']}")
+    print(f"notifications received: fast {result['received'][False]}, slow {result['received'][True]}")
+    metrics = result["metrics"]
+    if metrics:
+        print(f"publisher writes: {metrics['flushes']} flushes, latency mean "
+              f"{metrics['write_latency_mean'] * 1000:.3f}ms, max {metrics['write_latency_max'] * 1000:.3f}ms")
+        print(f"values published {metrics['published']}, coalesced before sampling {metrics['coalesced']}")
+        for subscription_id, stats in metrics["subscriptions"].items():
+            print(f"  subscription {subscription_id}: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Cold start benchmark: time from spawning run.py to the OPC-UA endpoint accepting connections.
+
+    python benchmarks/startup_bench.py --runs 10
+    python benchmarks/startup_bench.py --runs 10 --full   # server + web API
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST, PORT = "localhost", 4841
+
+
+def port_open() -> bool:
+    try:
+        with socket.create_connection((HOST, PORT), timeout=0.05):
+            return True
+    except OSError:
+        return False
+
+
+def cold_start(full: bool, timeout: float) -> float:
+    command = [sys.executable, os.path.join(ROOT, "run.py")]
+    if not full:
+        command.append("--server-only")
+
+    begin = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while not port_open():
+            if process.poll() is not None:
+                raise RuntimeError(f"run.py exited with code {process.returncode}")
+            if time.perf_counter() - begin > timeout:
+                raise TimeoutError("server did not become ready in time")
+            time.sleep(0.005)
+        return time.perf_counter() - begin
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--full", action="store_true", help="start the web API as well")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    if port_open():
+        sys.exit(f"Port {PORT} is already in use, stop the running server first")
+
+    samples = []
+    for i in range(args.runs):
+        samples.append(cold_start(args.full, args.timeout))
+        print(f"run {i + 1}: {samples[-1]:.3f}s")
+        while port_open():
+            time.sleep(0.05)
+
+    print(f"{'full' if args.full else 'server-only'} cold start over {args.runs} runs: "
+          f"mean {statistics.mean(samples):.3f}s, min {min(samples):.3f}s, max {max(samples):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,23 @@
+import argparse
 import asyncio
 import threading
-from api.app import app
-from backend.opcua_server import main as opcua_main
 
 
-def run_opcua_server():
+# Flask and asyncua are imported inside the runners, so each side only pays for
+# what it uses and the server starts loading while the API imports.
+def run_opcua_server(**server_options):
     """Run the OPC UA server in its own event loop"""
+    from backend.opcua_server import main as opcua_main
+
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    loop.run_until_complete(opcua_main())
+    loop.run_until_complete(opcua_main(**server_options))
     loop.close()
 
 def run_flask():
     """Run the Flask application"""
+    from api.app import app
+
     app.run(
             host='0.0.0.0',
             port=5000,
@@ -22,9 +27,34 @@ def run_flask():
         )
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="BandSaw OPC UA simulator")
+    parser.add_argument("--record", metavar="PATH", help="record every published value change to PATH")
+    parser.add_argument("--playback", metavar="PATH", help="serve a recorded value stream instead of the simulator")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="playback speed multiplier, 0 for as fast as possible (default: 1)")
+    parser.add_argument("--seek", type=float, default=0.0, metavar="SECONDS",
+                        help="start playback SECONDS into the recording")
+    parser.add_argument("--no-aspace-cache", action="store_true",
+                        help="build the standard OPC UA address space from scratch instead of the on-disk cache")
+    parser.add_argument("--server-only", action="store_true", help="run the OPC UA server without the web API")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    opcua_thread = threading.Thread(target=run_opcua_server)
-    opcua_thread.daemon = True
-    opcua_thread.start()
+    args = parse_args()
+    server_options = {
+        "record_path": args.record,
+        "playback_path": args.playback,
+        "playback_speed": args.speed,
+        "playback_start": args.seek,
+        "address_space_cache": not args.no_aspace_cache,
+    }
+    if args.server_only:
+        run_opcua_server(**server_options)
+    else:
+        opcua_thread = threading.Thread(target=run_opcua_server, kwargs=server_options)
+        opcua_thread.daemon = True
+        opcua_thread.start()
 
-    run_flask()
\ No newline at end of file
+        run_flask()
@@ -0,0 +1,37 @@
+import asyncio
+from types import SimpleNamespace
+
+from backend.alarm_events import AlarmEventQueue, publish_alarm_events
+from backend.bandsaw_simulator import AlarmType
+
+
+class FlakyEventGenerator:
+    """Fails on the first trigger, records the later ones"""
+
+    def __init__(self):
+        self.event = SimpleNamespace()
+        self.triggered = []
+        self.failed = False
+
+    async def trigger(self, time_attr=None, message=None):
+        if not self.failed:
+            self.failed = True
+            raise RuntimeError("address space not ready")
+        self.triggered.append((self.event.AlarmType, self.event.Active))
+
+
+def test_failed_trigger_does_not_stop_publishing():
+    async def run():
+        queue = AlarmEventQueue(maxsize=2)
+        generator = FlakyEventGenerator()
+        publisher = asyncio.create_task(publish_alarm_events(queue, generator))
+        for active in (True, False, True, False, True):
+            queue.push(AlarmType.BLADE_WEAR, active)
+            await asyncio.wait_for(queue.flush(), timeout=1)
+        await asyncio.wait_for(queue._queue.join(), timeout=1)
+        publisher.cancel()
+        return generator.triggered
+
+    triggered = asyncio.run(run())
+
+    assert triggered == [(AlarmType.BLADE_WEAR.value, active) for active in (False, True, False, True)]
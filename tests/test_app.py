@@ -0,0 +1,67 @@
+import pytest
+
+import api.app as app_module
+from backend.bandsaw_simulator import AlarmType, MachineState
+
+
+@pytest.fixture
+def written(monkeypatch):
+    """Values the endpoints write to the OPC-UA server, one dict per write request"""
+    writes = []
+    client = app_module.client
+    monkeypatch.setattr(client, "set_node_values", lambda values: writes.append(values))
+    monkeypatch.setattr(client, "set_node_value", lambda name, value: writes.append({name: value}))
+    monkeypatch.setattr(client, "run_async", lambda result: True)
+    return writes
+
+
+@pytest.fixture
+def api():
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize("alarm", ["SAFETY_BARRIER", AlarmType.SAFETY_BARRIER.value])
+def test_set_alarm_accepts_names_and_values(api, written, alarm):
+    response = api.post("/api/set_alarm", json={"alarm": alarm})
+
+    assert response.status_code == 200
+    assert written == [{"State": MachineState.ALARM.value, "AlarmType": AlarmType.SAFETY_BARRIER.value}]
+
+
+@pytest.mark.parametrize("body", [{}, {"alarm": "NONE"}, {"alarm": AlarmType.NONE.value}, {"alarm": "bogus"}])
+def test_set_alarm_rejects_invalid_alarms(api, written, body):
+    assert api.post("/api/set_alarm", json=body).status_code == 400
+    assert written == []
+
+
+@pytest.mark.parametrize("state", ["RUNNING", MachineState.RUNNING.value])
+def test_set_state_accepts_names_and_values(api, written, state):
+    response = api.post("/api/set_state", json={"state": state})
+
+    assert response.status_code == 200
+    assert written == [{"State": MachineState.RUNNING.value}]
+
+
+def test_set_state_rejects_unknown_states(api, written):
+    assert api.post("/api/set_state", json={"state": "bogus"}).status_code == 400
+    assert written == []
+
+
+def test_commands_converts_names_and_numbers(api, written):
+    response = api.post("/api/commands", json={"state": "RUNNING", "section_type": "ROUND", "cutting_speed": 80})
+
+    assert response.status_code == 200
+    assert written == [{"State": MachineState.RUNNING.value, "SectionType": "tondo", "CuttingSpeed": 80.0}]
+
+
+@pytest.mark.parametrize("body", [
+    {"cutting_speed": True},
+    {"cutting_speed": "80"},
+    {"feed_rate": None},
+    {"material": 42},
+    {"state": "RUNNING", "cutting_angle": False},
+    {"state": "RUNNING", "cutting_speed": -1},
+])
+def test_commands_rejects_wrong_types_and_values(api, written, body):
+    assert api.post("/api/commands", json=body).status_code == 400
+    assert written == []
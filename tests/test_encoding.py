@@ -0,0 +1,65 @@
+import math
+
+import pytest
+
+from api.encoding import decode_frame, encode_frame
+
+
+def test_round_trip_all_kinds():
+    columns = {
+        "state": ["in funzione", "allarme", "inattiva"],
+        "alarm_type": ["nessun allarme", "usura lama", "nessun allarme"],
+        "section_type": ["quadrato", "tondo", "quadrato"],
+        "pieces": [0, 15, -3],
+        "temperature": [20.0, 35.5, 1e-9],
+        "material": ["Acciai al carbonio St 37/42", "Leghe al nichel NiCr 19 NbMc", ""],
+        "active": [True, False, True],
+    }
+    assert decode_frame(encode_frame(columns)) == columns
+
+
+def test_missing_values_survive():
+    columns = {
+        "state": ["in funzione", None, "sconosciuto"],
+        "pieces": [None, 7, None],
+        "temperature": [None, 21.5, None],
+        "material": [None, "Ghisa GG30", "x"],
+        "active": [None, True, False],
+    }
+    decoded = decode_frame(encode_frame(columns))
+    assert decoded["state"] == ["in funzione", None, None]  # Unknown enum values decode as missing
+    assert decoded["pieces"] == [None, 7, None]
+    assert decoded["temperature"] == [None, 21.5, None]
+    assert decoded["material"] == ["", "Ghisa GG30", "x"]
+    assert decoded["active"] == [None, True, False]
+
+
+def test_bools_are_not_integers():
+    decoded = decode_frame(encode_frame({"active": [True, False]}))
+    assert decoded["active"] == [True, False]
+    assert all(isinstance(v, bool) for v in decoded["active"])
+
+
+@pytest.mark.parametrize("rows", [1, 8, 9, 17])
+def test_null_bitmap_spans_bytes(rows):
+    values = [None if i % 3 == 0 else i for i in range(rows)]
+    assert decode_frame(encode_frame({"pieces": values}))["pieces"] == values
+
+
+def test_mixed_int_float_column_is_float():
+    decoded = decode_frame(encode_frame({"speed": [1, 2.5]}))
+    assert decoded["speed"] == [1.0, 2.5]
+
+
+def test_empty_frame():
+    assert decode_frame(encode_frame({})) == {}
+    assert decode_frame(encode_frame({"pieces": []})) == {"pieces": []}
+
+
+def test_rejects_other_data():
+    with pytest.raises(ValueError):
+        decode_frame(b'{"json": true}')
+
+
+def test_nan_is_missing():
+    assert decode_frame(encode_frame({"temperature": [math.nan]}))["temperature"] == [None]
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from backend.bandsaw_simulator import AlarmType, BandSawSimulator, MachineState
+from backend.opcua_server import apply_client_values
+
+CARBON_STEEL = "Acciai al carbonio St 37/42"
+NICKEL_ALLOY = "Leghe al nichel NiCr 19 NbMc"
+
+
+def simulator_with(material=CARBON_STEEL):
+    simulator = BandSawSimulator(clock=datetime(2000, 1, 1))
+    simulator.set_material_parameters(material=material)
+    return simulator
+
+
+def test_reset_and_state_in_one_batch():
+    simulator = simulator_with()
+    simulator.set_alarm(AlarmType.SAFETY_BARRIER)
+
+    assert apply_client_values(simulator, {"AlarmType": AlarmType.NONE.value, "State": MachineState.RUNNING.value})
+
+    assert simulator.alarm == AlarmType.NONE
+    assert simulator.state == MachineState.RUNNING
+
+
+def test_cutting_speed_checked_against_material_in_same_batch():
+    simulator = simulator_with(CARBON_STEEL)
+    speed = simulator_with(NICKEL_ALLOY).recommended_cutting_speed
+    # Out of the ±20% range allowed for the old material
+    assert not 0.8 * simulator.recommended_cutting_speed <= speed <= 1.2 * simulator.recommended_cutting_speed
+
+    assert apply_client_values(simulator, {"CuttingSpeed": speed, "Material": NICKEL_ALLOY})
+
+    assert simulator.material == NICKEL_ALLOY
+    assert simulator.cutting_speed == speed
+
+
+def test_invalid_value_rejects_whole_batch():
+    simulator = simulator_with()
+    before = (simulator.state, simulator.material, simulator.cutting_speed)
+
+    assert not apply_client_values(simulator, {
+        "State": MachineState.RUNNING.value, "Material": NICKEL_ALLOY, "CuttingSpeed": -5.0,
+    })
+
+    assert (simulator.state, simulator.material, simulator.cutting_speed) == before
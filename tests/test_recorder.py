@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from backend.recorder import HEADER, MAGIC, ValuePlayer, ValueRecorder, TYPE_DOUBLE, TYPE_INT64, TYPE_STRING
+
+
+VARIABLES = [("State", TYPE_STRING), ("Pieces", TYPE_INT64), ("Temperature", TYPE_DOUBLE)]
+
+
+def write_recording(path):
+    with ValueRecorder(str(path), VARIABLES) as recorder:
+        start = recorder.start_time
+        recorder.record({"State": "inattiva", "Pieces": 0, "Temperature": 20.0}, start)
+        recorder.record({"State": "in funzione", "Pieces": 0, "Temperature": 20.5}, start + 1)
+        recorder.record({"State": "in funzione", "Pieces": 1, "Temperature": 21.25}, start + 2)
+        recorder.record({"State": "pausa", "Pieces": 1, "Temperature": 21.25}, start + 3)
+
+
+def test_round_trip_keeps_only_changes(tmp_path):
+    path = tmp_path / "values.bsrec"
+    write_recording(path)
+
+    with ValuePlayer(str(path)) as player:
+        assert player.variables == VARIABLES
+        assert list(player) == [
+            (0.0, "State", "inattiva"), (0.0, "Pieces", 0), (0.0, "Temperature", 20.0),
+            (1.0, "State", "in funzione"), (1.0, "Temperature", 20.5),
+            (2.0, "Pieces", 1), (2.0, "Temperature", 21.25),
+            (3.0, "State", "pausa"),
+        ]
+        assert player.duration == 3.0
+
+
+def test_seek_restores_state(tmp_path):
+    path = tmp_path / "values.bsrec"
+    write_recording(path)
+
+    with ValuePlayer(str(path)) as player:
+        assert player.seek(2.0) == {"State": "in funzione", "Pieces": 0, "Temperature": 20.5}
+        assert [record[0] for record in player] == [2.0, 2.0, 3.0]
+        assert player.seek(0.0) == {}
+
+
+def test_play_batches_by_timestamp(tmp_path):
+    path = tmp_path / "values.bsrec"
+    write_recording(path)
+
+    async def collect():
+        with ValuePlayer(str(path)) as player:
+            player.seek(1.0)
+            return [batch async for batch in player.play(speed=None)]
+
+    assert asyncio.run(collect()) == [
+        (1.0, {"State": "in funzione", "Temperature": 20.5}),
+        (2.0, {"Pieces": 1, "Temperature": 21.25}),
+        (3.0, {"State": "pausa"}),
+    ]
+
+
+def test_truncated_tail_is_ignored(tmp_path):
+    path = tmp_path / "values.bsrec"
+    write_recording(path)
+    data = path.read_bytes()
+    path.write_bytes(data[:-3])
+
+    with ValuePlayer(str(path)) as player:
+        assert len(player) == 7
+        assert player.seek(10.0)["State"] == "in funzione"
+
+
+def test_records_are_flushed_while_recording(tmp_path):
+    path = tmp_path / "values.bsrec"
+    recorder = ValueRecorder(str(path), VARIABLES)
+    recorder.record({"State": "in funzione", "Pieces": 3, "Temperature": 22.0})
+
+    with ValuePlayer(str(path)) as player:
+        assert len(player) == 3
+    recorder.close()
+
+
+@pytest.mark.parametrize("content", [b"", b"BSREC1\n\x00", MAGIC + HEADER.pack(0.0, 2) + b"\x05St"])
+def test_empty_or_truncated_header_is_rejected(tmp_path, content):
+    path = tmp_path / "values.bsrec"
+    path.write_bytes(content)
+
+    with pytest.raises(ValueError):
+        ValuePlayer(str(path))
@@ -0,0 +1,97 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from backend.bandsaw_simulator import BandSawSimulator, MachineState
+
+
+def running_simulator(seed, material="Acciai al carbonio St 37/42", section="<100mm", angle=0,
+                      speed_factor=1.0, feed_factor=1.0):
+    random.seed(seed)
+    simulator = BandSawSimulator(clock=datetime(2000, 1, 1))
+    simulator.set_material_parameters(material=material, section=section)
+    simulator.set_cutting_parameters(cutting_angle=angle)
+    simulator.set_cutting_parameters(cutting_speed=simulator.recommended_cutting_speed * speed_factor,
+                                     feed_rate=simulator.recommended_feed_rate * feed_factor)
+    simulator.state = MachineState.RUNNING
+    return simulator
+
+
+@pytest.mark.parametrize("seed, material, section, angle, speed_factor, feed_factor, n, dt", [
+    (1, "Acciai al carbonio St 37/42", "<100mm", 0, 1.0, 1.0, 20000, 0.1),
+    (2, "Ghisa GG30", "100-400mm", 45, 1.2, 0.8, 8000, 1.0),
+    (3, "Leghe al nichel NiCr 19 NbMc", "<100mm", 60, 0.8, 1.2, 3000, 2.5),
+    (4, "Acciai al carbonio St 37/42", "100-400mm", 0, 1.1, 1.1, 100000, 0.01),
+])
+def test_step_n_matches_update_state(seed, material, section, angle, speed_factor, feed_factor, n, dt):
+    batched = running_simulator(seed, material, section, angle, speed_factor, feed_factor)
+    batched.step_n(n, dt)
+    stepped = running_simulator(seed, material, section, angle, speed_factor, feed_factor)
+    for _ in range(n):
+        stepped.update_state(dt)
+
+    assert batched.clock == stepped.clock
+    assert (batched.state, batched.alarm) == (stepped.state, stepped.alarm)
+    assert batched.pieces == stepped.pieces
+    assert batched.scrap_pieces == stepped.scrap_pieces
+    assert batched.total_pieces_attempted == stepped.total_pieces_attempted
+    assert batched.last_piece_time == stepped.last_piece_time
+    assert batched.production_time == stepped.production_time
+    assert batched.blade_wear == pytest.approx(stepped.blade_wear, abs=1e-9)
+    assert batched.cut_progress == pytest.approx(stepped.cut_progress, abs=1e-6)
+    # Operating conditions are held per batch, so the physics only match closely
+    assert batched.temperature == pytest.approx(stepped.temperature, abs=0.01)
+    assert batched.coolant_level == pytest.approx(stepped.coolant_level, abs=0.01)
+
+
+def test_step_n_batches_ticks(monkeypatch):
+    simulator = running_simulator(5)
+    calls = []
+    update_state = simulator.update_state
+    monkeypatch.setattr(simulator, "update_state", lambda dt=None: calls.append(dt) or update_state(dt))
+
+    simulator.step_n(100000, 0.01)
+
+    assert simulator.total_pieces_attempted > 0
+    assert len(calls) < 100
+
+
+def test_step_n_without_clock_keeps_pause():
+    simulator = BandSawSimulator()
+    simulator.state = MachineState.PAUSED
+    simulator.last_state_change = simulator.now()
+
+    simulator.step_n(1000, 0.1)
+
+    assert simulator.state == MachineState.PAUSED
+    assert simulator.production_time.total_seconds() == pytest.approx(100)
+
+
+def test_integrate_does_not_depend_on_dt():
+    coarse, fine = running_simulator(6), running_simulator(6)
+    coarse.consumption = fine.consumption = 1500.0
+
+    for _ in range(600):
+        coarse.integrate(1.0)
+    for _ in range(6000):
+        fine.integrate(0.1)
+
+    assert coarse.temperature > 60  # Heated well above ambient
+    assert coarse.temperature == pytest.approx(fine.temperature, abs=0.02)
+    assert coarse.blade_wear == pytest.approx(fine.blade_wear)
+    assert coarse.coolant_level == pytest.approx(fine.coolant_level, abs=0.01)
+
+
+@pytest.mark.parametrize("dt", [0.1, 0.75, 5.0])
+def test_advance_production_does_not_depend_on_dt(dt):
+    reference, simulator = running_simulator(7), running_simulator(7)
+    reference.JAM_PROBABILITY = simulator.JAM_PROBABILITY = 0.0
+
+    reference.advance_production(600.0, reference.now())
+    for _ in range(round(600 / dt)):
+        simulator.advance_production(dt, simulator.now())
+
+    assert simulator.total_pieces_attempted == reference.total_pieces_attempted
+    assert simulator.pieces == reference.pieces
+    assert simulator.cut_progress == pytest.approx(reference.cut_progress, abs=1e-6)